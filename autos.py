@@ -1,83 +1,295 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from database import get_session
-from repository import AutoRepository
+from datetime import datetime
+from database import get_async_session, get_async_read_session, leer_tus_escrituras, motor_async_lectura
+from repository_async import AsyncAutoRepository, AsyncCambioRepository
+from cache import EntradaCache
+import etags
+import exportacion
+import importacion
 import models
+import serializacion
 
 router = APIRouter(prefix="/autos", tags=["Autos"])
 
+def respuesta_cacheada(entrada: EntradaCache, request: Request) -> Response:
+    """Devuelve el cuerpo ya serializado, o 304 si el cliente tiene el mismo ETag"""
+    headers = {"ETag": entrada.etag}
+    if etags.coincide(request, entrada.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entrada.cuerpo, media_type="application/json", headers=headers)
+
 @router.post("/", response_model=models.AutoResponse)
-def crear_auto(
+async def crear_auto(
     auto: models.AutoCreate, 
-    session: Session = Depends(get_session)
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Crear nuevo auto"""
-    repo = AutoRepository(session)
+    repo = AsyncAutoRepository(session)
     try:
-        return repo.create(auto)
+        creado = await repo.create(auto)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    leer_tus_escrituras(response)
+    return creado
 
-@router.get("/", response_model=List[models.AutoResponse])
-def listar_autos(
-    skip: int = 0,
-    limit: int = 100,
+@router.post("/bulk", response_model=models.ImportacionResponse)
+async def importar_autos(request: Request, response: Response, session: AsyncSession = Depends(get_async_session)):
+    """Importación masiva de autos
+
+    Acepta un arreglo JSON (`application/json`), NDJSON (`application/x-ndjson`)
+    o CSV con encabezado (`text/csv`). Las filas inválidas se informan en
+    `errores` sin interrumpir la carga del resto.
+    """
+    tipo = request.headers.get("content-type", "application/json").split(";")[0].strip()
+    formato = importacion.FORMATOS.get(tipo)
+    if not formato:
+        raise HTTPException(status_code=415, detail=f"Formato no soportado: {tipo}")
+    repo = AsyncAutoRepository(session)
+    try:
+        resultado = await importacion.importar_autos(repo, importacion.leer_filas(formato, request.stream()))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    leer_tus_escrituras(response)
+    return resultado
+
+def filtros_auto(
     marca: Optional[str] = Query(None),
     modelo: Optional[str] = Query(None),
-    session: Session = Depends(get_session)
+    precio_min: Optional[float] = Query(None, ge=0),
+    precio_max: Optional[float] = Query(None, ge=0),
+    anio_min: Optional[int] = Query(None),
+    anio_max: Optional[int] = Query(None),
+    kilometraje_min: Optional[float] = Query(None, ge=0),
+    kilometraje_max: Optional[float] = Query(None, ge=0),
+    color: List[str] = Query([]),
+    tipo_combustible: List[str] = Query([]),
+    estado: List[models.EstadoAuto] = Query([]),
+) -> models.FiltrosAuto:
+    """Filtros del listado: rangos de precio/año/kilometraje y conjuntos repetibles"""
+    return models.FiltrosAuto(
+        marca=marca,
+        modelo=modelo,
+        precio_min=precio_min,
+        precio_max=precio_max,
+        anio_min=anio_min,
+        anio_max=anio_max,
+        kilometraje_min=kilometraje_min,
+        kilometraje_max=kilometraje_max,
+        color=color,
+        tipo_combustible=tipo_combustible,
+        estado=[valor.value for valor in estado],
+    )
+
+@router.post("/batch", response_model=List[models.LoteAutoItem])
+async def obtener_autos_por_ids(lote: models.LoteIdsRequest, session: AsyncSession = Depends(get_async_read_session)):
+    """Obtener varios autos por id en una sola consulta, en el orden pedido"""
+    repo = AsyncAutoRepository(session)
+    autos = await repo.get_many_by_ids(lote.ids)
+    return [
+        {"clave": str(auto_id), "encontrado": auto is not None, "auto": auto}
+        for auto_id, auto in zip(lote.ids, autos)
+    ]
+
+@router.post("/chasis/batch", response_model=List[models.LoteAutoItem])
+async def obtener_autos_por_chasis(lote: models.LoteChasisRequest, session: AsyncSession = Depends(get_async_read_session)):
+    """Obtener varios autos por número de chasis en una sola consulta, en el orden pedido"""
+    repo = AsyncAutoRepository(session)
+    autos = await repo.get_many_by_chasis(lote.chasis)
+    return [
+        {"clave": numero_chasis, "encontrado": auto is not None, "auto": auto}
+        for numero_chasis, auto in zip(lote.chasis, autos)
+    ]
+
+@router.patch("/bulk", response_model=models.ActualizacionMasivaResponse)
+async def actualizar_autos(
+    actualizacion: models.ActualizacionMasivaAutos,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Actualizar en bloque los autos de una lista de ids o de un filtro
+
+    Los `cambios` se aplican igual a todos; `porcentaje_precio` ajusta el
+    precio de cada auto en ese porcentaje. Todo corre como un único UPDATE.
+    """
+    repo = AsyncAutoRepository(session)
+    actualizados = await repo.update_many(
+        actualizacion.criterio, actualizacion.cambios, actualizacion.porcentaje_precio
+    )
+    leer_tus_escrituras(response)
+    return {"actualizados": actualizados}
+
+@router.get("/", response_model=List[models.AutoResponse])
+async def listar_autos(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
+    orden: models.OrdenAutos = Query(models.OrdenAutos.ID),
+    descendente: bool = Query(False),
+    filtros: models.FiltrosAuto = Depends(filtros_auto),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Listar autos con filtros
+
+    Sin `skip` se pagina por cursor: el encabezado `X-Next-Cursor` trae el
+    valor a enviar en `cursor` para pedir la página siguiente. `color`,
+    `tipo_combustible` y `estado` se pueden repetir para filtrar por varios valores.
+    Con `If-None-Match` y sin cambios en autos responde 304 sin consultar la base.
+    """
+    no_modificado = await etags.no_modificado(request, ("auto",))
+    if no_modificado:
+        return no_modificado
+    repo = AsyncAutoRepository(session)
+    rapida = serializacion.activa("listar_autos")
+    columnas = serializacion.COLUMNAS_AUTO if rapida else None
+    headers = await etags.encabezados(request, session, ("auto",))
+    if skip and not cursor:
+        if set(filtros.dict(exclude_defaults=True)) - {"marca", "modelo"}:
+            raise HTTPException(status_code=400, detail="Los filtros por rango o conjunto se paginan con cursor")
+        if filtros.marca or filtros.modelo:
+            autos = await repo.search_by_marca_modelo(filtros.marca, filtros.modelo, skip, limit, columnas)
+        else:
+            autos = await repo.get_all(skip, limit, columnas)
+    else:
+        try:
+            autos, next_cursor = await repo.filtrar(filtros, cursor, limit, orden.value, descendente, columnas)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+    if rapida:
+        return serializacion.respuesta(serializacion.CAMPOS_AUTO, autos, headers)
+    response.headers.update(headers)
+    return autos
+
+@router.get("/catalogo", response_model=models.CatalogoAutosResponse)
+async def catalogo_autos(
+    request: Request,
+    response: Response,
+    limit: int = Query(24, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    orden: models.OrdenAutos = Query(models.OrdenAutos.ID),
+    descendente: bool = Query(False),
+    filtros: models.FiltrosAuto = Depends(filtros_auto),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Página filtrada junto con el total y las facetas (marca, combustible, banda de precio)"""
+    no_modificado = await etags.no_modificado(request, ("auto",))
+    if no_modificado:
+        return no_modificado
+    repo = AsyncAutoRepository(session)
+    response.headers.update(await etags.encabezados(request, session, ("auto",)))
+    try:
+        autos, next_cursor = await repo.filtrar(filtros, cursor, limit, orden.value, descendente)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total, facetas = await repo.facetas(filtros)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return {"total": total, "items": autos, "facetas": facetas}
+
+@router.get("/export")
+async def exportar_autos(
+    request: Request,
+    formato: exportacion.FormatoExportacion = exportacion.FormatoExportacion.NDJSON,
+    desde: Optional[datetime] = Query(None, description="fecha_ingreso desde"),
+    hasta: Optional[datetime] = Query(None, description="fecha_ingreso hasta"),
+    estado: Optional[models.EstadoAuto] = Query(None),
 ):
-    """Listar autos con filtros"""
-    repo = AutoRepository(session)
-    if marca or modelo:
-        return repo.search_by_marca_modelo(marca, modelo)
-    return repo.get_all(skip, limit)
+    """Exportar autos como NDJSON o CSV en streaming"""
+    statement = exportacion.sentencia_autos(desde, hasta, estado.value if estado else None)
+    return StreamingResponse(
+        exportacion.generar(statement, exportacion.COLUMNAS_AUTO, formato, motor_async_lectura(request)),
+        media_type=exportacion.MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f"attachment; filename=autos.{formato.value}"},
+    )
+
+@router.get("/with-ventas", response_model=List[models.AutoResponseWithVentas])
+async def listar_autos_con_ventas(
+    skip: int = 0,
+    limit: int = Query(100, le=500),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Listar autos con sus ventas (cantidad fija de consultas)"""
+    repo = AsyncAutoRepository(session)
+    return await repo.get_all_with_ventas(skip, limit)
+
+@router.get("/buscar", response_model=List[models.AutoResponse])
+async def buscar_autos(
+    q: str = Query(..., min_length=1),
+    skip: int = 0,
+    limit: int = Query(20, le=100),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Buscar autos por marca, modelo o descripción, ordenados por relevancia"""
+    repo = AsyncAutoRepository(session)
+    return await repo.buscar(q, skip, limit)
 
 @router.get("/{auto_id}", response_model=models.AutoResponse)
-def obtener_auto(auto_id: int, session: Session = Depends(get_session)):
+async def obtener_auto(auto_id: int, request: Request, session: AsyncSession = Depends(get_async_session)):
     """Obtener auto por ID"""
-    repo = AutoRepository(session)
-    auto = repo.get_by_id(auto_id)
-    if not auto:
+    repo = AsyncAutoRepository(session)
+    entrada = await repo.get_by_id_cached(auto_id)
+    if not entrada:
         raise HTTPException(status_code=404, detail="Auto no encontrado")
-    return auto
+    return respuesta_cacheada(entrada, request)
 
 @router.put("/{auto_id}", response_model=models.AutoResponse)
-def actualizar_auto(
+async def actualizar_auto(
     auto_id: int, 
     auto_update: models.AutoUpdate, 
-    session: Session = Depends(get_session)
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Actualizar auto"""
-    repo = AutoRepository(session)
-    auto = repo.update(auto_id, auto_update)
+    repo = AsyncAutoRepository(session)
+    auto = await repo.update(auto_id, auto_update)
     if not auto:
         raise HTTPException(status_code=404, detail="Auto no encontrado")
+    leer_tus_escrituras(response)
     return auto
 
 @router.delete("/{auto_id}")
-def eliminar_auto(auto_id: int, session: Session = Depends(get_session)):
+async def eliminar_auto(auto_id: int, response: Response, session: AsyncSession = Depends(get_async_session)):
     """Eliminar auto"""
-    repo = AutoRepository(session)
-    success = repo.delete(auto_id)
+    repo = AsyncAutoRepository(session)
+    success = await repo.delete(auto_id)
     if not success:
         raise HTTPException(status_code=404, detail="Auto no encontrado")
+    leer_tus_escrituras(response)
     return {"message": "Auto eliminado correctamente"}
 
 @router.get("/chasis/{numero_chasis}", response_model=models.AutoResponse)
-def buscar_por_chasis(numero_chasis: str, session: Session = Depends(get_session)):
+async def buscar_por_chasis(numero_chasis: str, request: Request, session: AsyncSession = Depends(get_async_session)):
     """Buscar auto por número de chasis"""
-    repo = AutoRepository(session)
-    auto = repo.get_by_chasis(numero_chasis)
-    if not auto:
+    repo = AsyncAutoRepository(session)
+    entrada = await repo.get_by_chasis_cached(numero_chasis)
+    if not entrada:
         raise HTTPException(status_code=404, detail="Auto no encontrado")
-    return auto
+    return respuesta_cacheada(entrada, request)
+
+@router.get("/{auto_id}/historial", response_model=List[models.CambioResponse])
+async def historial_auto(
+    auto_id: int,
+    desde: Optional[datetime] = Query(None),
+    hasta: Optional[datetime] = Query(None),
+    limit: int = Query(100, le=1000),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Altas, modificaciones (valor anterior y nuevo) y baja de un auto"""
+    repo = AsyncCambioRepository(session)
+    return await repo.historial("auto", auto_id, desde, hasta, limit)
 
 @router.get("/{auto_id}/with-ventas", response_model=models.AutoResponseWithVentas)
-def auto_con_ventas(auto_id: int, session: Session = Depends(get_session)):
+async def auto_con_ventas(auto_id: int, session: AsyncSession = Depends(get_async_read_session)):
     """Obtener auto con sus ventas"""
-    repo = AutoRepository(session)
-    auto = repo.get_by_id(auto_id)
+    repo = AsyncAutoRepository(session)
+    auto = await repo.get_by_id_with_ventas(auto_id)
     if not auto:
         raise HTTPException(status_code=404, detail="Auto no encontrado")
     return auto
\ No newline at end of file
@@ -0,0 +1,355 @@
+"""Suite de benchmarks de la API
+
+Siembra una base (SQLite local por defecto, o la indicada en --database-url),
+ejecuta cada escenario contra la app en proceso o sobre uvicorn y reporta
+latencias p50/p95/p99, throughput y consultas SQL por request en JSON.
+
+Uso:
+    python -m benchmarks.benchmark --autos 10000 --ventas 5000 --concurrencia 32
+    python -m benchmarks.benchmark --salida base.json
+    python -m benchmarks.benchmark --baseline base.json --umbral 0.2
+    python -m benchmarks.benchmark --modo uvicorn --workers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MARCAS = {
+    "Toyota": ["Corolla", "Hilux", "Etios", "Yaris"],
+    "Ford": ["Focus", "Ranger", "Fiesta", "Ka"],
+    "Chevrolet": ["Cruze", "Onix", "S10", "Tracker"],
+    "Volkswagen": ["Gol", "Amarok", "Polo", "Vento"],
+    "Renault": ["Sandero", "Kangoo", "Duster", "Logan"],
+}
+COLORES = ["blanco", "negro", "gris", "rojo", "azul"]
+COMBUSTIBLES = ["gasolina", "diesel", "electrico", "hibrido"]
+COMPRADORES = ["María González", "Juan Pérez", "Ana López", "Carlos Díaz", "Lucía Romero"]
+
+def parsear_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="por defecto SQLite en un directorio temporal")
+    parser.add_argument("--autos", type=int, default=10000)
+    parser.add_argument("--ventas", type=int, default=5000)
+    parser.add_argument("--resembrar", action="store_true", help="borrar y volver a sembrar la base")
+    parser.add_argument("--modo", choices=["proceso", "uvicorn"], default="proceso")
+    parser.add_argument("--workers", type=int, default=1, help="workers de uvicorn (modo uvicorn)")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="requests por escenario")
+    parser.add_argument("--escenarios", default="", help="lista separada por comas; vacío = todos")
+    parser.add_argument("--salida", default=None, help="archivo JSON donde guardar el resultado")
+    parser.add_argument("--baseline", default=None, help="resultado previo contra el que comparar")
+    parser.add_argument("--umbral", type=float, default=0.2, help="regresión tolerada (0.2 = 20%%)")
+    parser.add_argument("--semilla", type=int, default=42)
+    return parser.parse_args(argv)
+
+def configurar_entorno(args):
+    """Fija DATABASE_URL antes de importar la app"""
+    if not args.database_url:
+        ruta = os.path.join(tempfile.gettempdir(), f"concesionaria_bench_{args.autos}_{args.ventas}.db")
+        args.database_url = f"sqlite:///{ruta}"
+        if args.resembrar and os.path.exists(ruta):
+            os.remove(ruta)
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DB_ECHO", "false")
+    # sembrar() prepara la base una vez; la app (o los workers de uvicorn,
+    # que heredan el entorno) arranca sin volver a crear el esquema ni los resúmenes
+    os.environ["DB_INIT_EN_STARTUP"] = "false"
+
+def sembrar(args):
+    """Carga con INSERT multi-fila los autos BENCH* (y sus ventas) que falten"""
+    from sqlmodel import Session, select
+    from sqlalchemy import insert
+    from database import engine, create_db_and_tables
+    from models import Auto, Venta, hora_argentina
+    from repository import ResumenRepository
+    from datetime import timedelta
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        existentes = set(session.exec(select(Auto.numero_chasis).where(Auto.numero_chasis.like("BENCH%"))).all())
+    faltantes = [i for i in range(args.autos) if f"BENCH{i:012d}" not in existentes]
+    if not faltantes:
+        return
+    rnd = random.Random(args.semilla)
+    ahora = hora_argentina()
+    lote = 5000
+    with engine.begin() as conn:
+        for inicio in range(0, len(faltantes), lote):
+            indices = faltantes[inicio:inicio + lote]
+            filas = []
+            for i in indices:
+                marca = rnd.choice(list(MARCAS))
+                filas.append({
+                    "marca": marca,
+                    "modelo": rnd.choice(MARCAS[marca]),
+                    "anio": rnd.randint(2000, 2025),
+                    "numero_chasis": f"BENCH{i:012d}",
+                    "precio": round(rnd.uniform(5000, 80000), 2),
+                    "kilometraje": round(rnd.uniform(0, 250000)),
+                    "color": rnd.choice(COLORES),
+                    "tipo_combustible": rnd.choice(COMBUSTIBLES),
+                    "descripcion": f"{marca} en muy buen estado, unidad {i}",
+                    "imagen_url": None,
+                    "estado": "vendido" if i < args.ventas else "disponible",
+                    "fecha_ingreso": ahora - timedelta(days=rnd.randint(0, 1500)),
+                })
+            ids = conn.scalars(insert(Auto).returning(Auto.id, sort_by_parameter_order=True), filas).all()
+            vendidos = [auto_id for i, auto_id in zip(indices, ids) if i < args.ventas]
+            if vendidos:
+                conn.execute(insert(Venta), [
+                    {
+                        "nombre_comprador": rnd.choice(COMPRADORES),
+                        "precio": round(rnd.uniform(5000, 80000), 2),
+                        "fecha_venta": ahora - timedelta(days=rnd.randint(0, 1500)),
+                        "auto_id": auto_id,
+                    }
+                    for auto_id in vendidos
+                ])
+    with Session(engine) as session:
+        ResumenRepository(session).reconstruir()
+
+def escenarios(args):
+    """Nombre -> función que arma (método, path, cuerpo) para cada request"""
+    from repository import codificar_cursor
+    rnd = random.Random(args.semilla)
+    n_autos = max(args.autos, 1)
+    n_ventas = max(args.ventas, 1)
+    profundo = max(n_autos - 100, 0)
+    return {
+        "autos_listar": lambda: ("GET", "/autos/?limit=100", None),
+        "autos_offset_profundo": lambda: ("GET", f"/autos/?skip={profundo}&limit=100", None),
+        "autos_cursor_profundo": lambda: ("GET", "/autos/?limit=100&cursor=" + codificar_cursor("id", profundo, profundo), None),
+        "autos_por_id": lambda: ("GET", f"/autos/{rnd.randint(1, n_autos)}", None),
+        "autos_por_chasis": lambda: ("GET", f"/autos/chasis/BENCH{rnd.randrange(n_autos):012d}", None),
+        "autos_filtro_marca": lambda: ("GET", f"/autos/?marca={rnd.choice(list(MARCAS))}&limit=50", None),
+        "autos_buscar": lambda: ("GET", f"/autos/buscar?q={rnd.choice(['Corolla', 'Ranger', 'estado', 'Onix'])}", None),
+        "autos_con_ventas": lambda: ("GET", f"/autos/{rnd.randint(1, n_autos)}/with-ventas", None),
+        "autos_listar_con_ventas": lambda: ("GET", "/autos/with-ventas?limit=100", None),
+        "ventas_listar": lambda: ("GET", "/ventas/?limit=100", None),
+        "ventas_por_id": lambda: ("GET", f"/ventas/{rnd.randint(1, n_ventas)}", None),
+        "ventas_con_auto": lambda: ("GET", f"/ventas/{rnd.randint(1, n_ventas)}/with-auto", None),
+        "ventas_listar_con_auto": lambda: ("GET", "/ventas/with-auto?limit=100", None),
+        "ventas_por_comprador": lambda: ("GET", f"/ventas/comprador/{rnd.choice(COMPRADORES).split()[0]}?limit=50", None),
+        "estadisticas": lambda: ("GET", "/estadisticas", None),
+    }
+
+class ContadorSQL:
+    """Cuenta sentencias ejecutadas por los motores de la app (solo modo proceso)"""
+
+    def __init__(self):
+        from sqlalchemy import event
+        import database
+        self.total = 0
+        for engine in (database.engine, database.async_engine.sync_engine):
+            event.listen(engine, "before_cursor_execute", self._contar)
+
+    def _contar(self, *args):
+        self.total += 1
+
+    async def leer(self, cliente) -> int:
+        return self.total
+
+class ContadorMetricas:
+    """Suma db_queries_total de /metrics (modo uvicorn con un solo worker)
+
+    El registro de métricas es por proceso: con varios workers cada scrape
+    vería solo el del worker que lo atendió.
+    """
+
+    async def leer(self, cliente) -> int:
+        respuesta = await cliente.get("/metrics")
+        respuesta.raise_for_status()
+        total = 0
+        for linea in respuesta.text.splitlines():
+            if linea.startswith("db_queries_total{") and 'route="/metrics' not in linea:
+                total += int(float(linea.rsplit(" ", 1)[1]))
+        return total
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+async def medir(cliente, generador, total, concurrencia):
+    latencias = []
+    errores = 0
+    pendientes = iter(range(total))
+
+    async def trabajador():
+        nonlocal errores
+        for _ in pendientes:
+            metodo, path, cuerpo = generador()
+            inicio = time.perf_counter()
+            respuesta = await cliente.request(metodo, path, json=cuerpo)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if respuesta.status_code >= 500:
+                errores += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*[trabajador() for _ in range(concurrencia)])
+    duracion = time.perf_counter() - inicio
+    return {
+        "requests": total,
+        "errores": errores,
+        "p50_ms": round(percentil(latencias, 50), 3),
+        "p95_ms": round(percentil(latencias, 95), 3),
+        "p99_ms": round(percentil(latencias, 99), 3),
+        "media_ms": round(statistics.fmean(latencias), 3) if latencias else 0.0,
+        "rps": round(total / duracion, 1) if duracion else 0.0,
+    }
+
+async def ventas_concurrentes(cliente, args):
+    """Muchas ventas en paralelo sobre pocos autos: ninguno se vende dos veces"""
+    creados = []
+    for i in range(10):
+        respuesta = await cliente.post("/autos/", json={
+            "marca": "Bench", "modelo": "Contencion", "anio": 2024,
+            "numero_chasis": f"CONT{time.time_ns() % 10**12:012d}{i}",
+            "precio": 1000, "kilometraje": 0, "color": "gris", "tipo_combustible": "diesel",
+        })
+        creados.append(respuesta.json()["id"])
+    rnd = random.Random(args.semilla)
+    estados = []
+
+    async def vender(auto_id):
+        inicio = time.perf_counter()
+        respuesta = await cliente.post("/ventas/", json={"nombre_comprador": "Bench", "precio": 900, "auto_id": auto_id})
+        estados.append((auto_id, respuesta.status_code, (time.perf_counter() - inicio) * 1000))
+
+    intentos = [rnd.choice(creados) for _ in range(args.requests)]
+    inicio = time.perf_counter()
+    for desde in range(0, len(intentos), args.concurrencia):
+        await asyncio.gather(*[vender(a) for a in intentos[desde:desde + args.concurrencia]])
+    duracion = time.perf_counter() - inicio
+    exitos = {}
+    for auto_id, codigo, _ in estados:
+        if codigo == 200:
+            exitos[auto_id] = exitos.get(auto_id, 0) + 1
+    latencias = [ms for _, _, ms in estados]
+    return {
+        "requests": len(estados),
+        "errores": sum(1 for _, codigo, _ in estados if codigo >= 500),
+        "p50_ms": round(percentil(latencias, 50), 3),
+        "p95_ms": round(percentil(latencias, 95), 3),
+        "p99_ms": round(percentil(latencias, 99), 3),
+        "rps": round(len(estados) / duracion, 1) if duracion else 0.0,
+        "autos_vendidos_dos_veces": sum(1 for n in exitos.values() if n > 1),
+    }
+
+async def ejecutar(args, cliente, contador=None):
+    resultados = {}
+    seleccion = {e for e in args.escenarios.split(",") if e}
+    for nombre, generador in escenarios(args).items():
+        if seleccion and nombre not in seleccion:
+            continue
+        await medir(cliente, generador, min(args.concurrencia, args.requests), args.concurrencia)
+        antes = await contador.leer(cliente) if contador else None
+        resultado = await medir(cliente, generador, args.requests, args.concurrencia)
+        if contador:
+            resultado["queries_por_request"] = round((await contador.leer(cliente) - antes) / args.requests, 2)
+        resultados[nombre] = resultado
+        print(f"{nombre:28s} p50={resultado['p50_ms']:8.2f}ms p95={resultado['p95_ms']:8.2f}ms "
+              f"p99={resultado['p99_ms']:8.2f}ms {resultado['rps']:8.1f} req/s", file=sys.stderr)
+    if not seleccion or "ventas_concurrentes" in seleccion:
+        resultados["ventas_concurrentes"] = await ventas_concurrentes(cliente, args)
+    return resultados
+
+async def ejecutar_en_proceso(args):
+    import httpx
+    import main
+    contador = ContadorSQL()
+    async with main.lifespan(main.app):
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+            return await ejecutar(args, cliente, contador)
+
+async def ejecutar_en_uvicorn(args):
+    import httpx
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.puerto),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    base = f"http://127.0.0.1:{args.puerto}"
+    try:
+        limites = httpx.Limits(max_connections=args.concurrencia)
+        async with httpx.AsyncClient(base_url=base, limits=limites, timeout=60) as cliente:
+            for _ in range(100):
+                try:
+                    if (await cliente.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn no respondió a /health")
+            if args.workers > 1:
+                print("queries_por_request se omite con más de un worker (métricas por proceso)", file=sys.stderr)
+            return await ejecutar(args, cliente, ContadorMetricas() if args.workers == 1 else None)
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+
+def comparar(resultado, baseline, umbral):
+    """Lista de regresiones de latencia p95 o throughput por encima del umbral"""
+    regresiones = []
+    for nombre, actual in resultado["escenarios"].items():
+        previo = baseline.get("escenarios", {}).get(nombre)
+        if not previo:
+            continue
+        if previo["p95_ms"] and actual["p95_ms"] > previo["p95_ms"] * (1 + umbral):
+            regresiones.append(f"{nombre}: p95 {previo['p95_ms']}ms -> {actual['p95_ms']}ms")
+        if previo["rps"] and actual["rps"] < previo["rps"] * (1 - umbral):
+            regresiones.append(f"{nombre}: throughput {previo['rps']} -> {actual['rps']} req/s")
+        if actual.get("autos_vendidos_dos_veces"):
+            regresiones.append(f"{nombre}: {actual['autos_vendidos_dos_veces']} autos vendidos dos veces")
+    return regresiones
+
+def main(argv=None):
+    args = parsear_argumentos(argv)
+    configurar_entorno(args)
+    sembrar(args)
+    if args.modo == "uvicorn":
+        escenarios_resultado = asyncio.run(ejecutar_en_uvicorn(args))
+    else:
+        escenarios_resultado = asyncio.run(ejecutar_en_proceso(args))
+    resultado = {
+        "config": {
+            "database": args.database_url.split("://")[0],
+            "autos": args.autos,
+            "ventas": args.ventas,
+            "modo": args.modo,
+            "workers": args.workers,
+            "concurrencia": args.concurrencia,
+            "requests": args.requests,
+        },
+        "escenarios": escenarios_resultado,
+    }
+    salida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(salida)
+    print(salida)
+
+    regresiones = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as archivo:
+            regresiones = comparar(resultado, json.load(archivo), args.umbral)
+    elif escenarios_resultado.get("ventas_concurrentes", {}).get("autos_vendidos_dos_veces"):
+        regresiones = ["ventas_concurrentes: hay autos vendidos dos veces"]
+    for regresion in regresiones:
+        print(f"REGRESIÓN {regresion}", file=sys.stderr)
+    return 1 if regresiones else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""CPU por fila de los listados con y sin el camino de serialización liviano
+
+Para cada ruta de listado mide, en proceso y de a un request por vez, el
+tiempo de CPU del proceso por fila devuelta con SERIALIZACION_RAPIDA
+desactivada (instancias ORM + response_model) y activada (tuplas + orjson).
+
+Uso:
+    python -m benchmarks.serializacion --autos 10000 --ventas 5000 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from benchmarks.benchmark import COMPRADORES, configurar_entorno, sembrar
+
+RUTAS = {
+    "listar_autos": "/autos/?limit={limit}",
+    "listar_ventas": "/ventas/?limit={limit}",
+    "ventas_por_auto": "/ventas/auto/1",
+    "ventas_por_comprador": "/ventas/comprador/" + COMPRADORES[0].split()[0] + "?limit={limit}",
+}
+
+def parsear_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="por defecto SQLite en un directorio temporal")
+    parser.add_argument("--autos", type=int, default=10000)
+    parser.add_argument("--ventas", type=int, default=5000)
+    parser.add_argument("--resembrar", action="store_true", help="borrar y volver a sembrar la base")
+    parser.add_argument("--requests", type=int, default=200, help="requests por ruta y modo")
+    parser.add_argument("--limit", type=int, default=100, help="filas por página")
+    parser.add_argument("--salida", default=None, help="archivo JSON donde guardar el resultado")
+    parser.add_argument("--semilla", type=int, default=42)
+    return parser.parse_args(argv)
+
+async def medir(cliente, path, requests):
+    filas = 0
+    await cliente.get(path)
+    cpu = time.process_time()
+    reloj = time.perf_counter()
+    for _ in range(requests):
+        respuesta = await cliente.get(path)
+        respuesta.raise_for_status()
+        filas += len(respuesta.json())
+    cpu = time.process_time() - cpu
+    reloj = time.perf_counter() - reloj
+    return {
+        "filas_por_request": round(filas / requests, 1),
+        "cpu_ms_por_request": round(cpu * 1000 / requests, 3),
+        "cpu_us_por_fila": round(cpu * 1e6 / filas, 3) if filas else None,
+        "ms_por_request": round(reloj * 1000 / requests, 3),
+    }
+
+async def ejecutar(args):
+    import httpx
+    import main
+    import serializacion
+    resultados = {}
+    async with main.lifespan(main.app):
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+            for ruta, plantilla in RUTAS.items():
+                path = plantilla.format(limit=args.limit)
+                resultado = {}
+                for modo, activa in (("orm", False), ("rapida", True)):
+                    serializacion.SERIALIZACION_RAPIDA.discard(ruta)
+                    if activa:
+                        serializacion.SERIALIZACION_RAPIDA.add(ruta)
+                    resultado[modo] = await medir(cliente, path, args.requests)
+                antes, despues = resultado["orm"]["cpu_ms_por_request"], resultado["rapida"]["cpu_ms_por_request"]
+                resultado["mejora_cpu"] = round(antes / despues, 2) if despues else None
+                resultados[ruta] = resultado
+                print(f"{ruta:24s} orm={resultado['orm']['cpu_us_por_fila']}us/fila "
+                      f"rapida={resultado['rapida']['cpu_us_por_fila']}us/fila x{resultado['mejora_cpu']}",
+                      file=sys.stderr)
+    return resultados
+
+def main(argv=None):
+    args = parsear_argumentos(argv)
+    configurar_entorno(args)
+    sembrar(args)
+    resultado = {
+        "config": {"autos": args.autos, "ventas": args.ventas, "requests": args.requests, "limit": args.limit},
+        "rutas": asyncio.run(ejecutar(args)),
+    }
+    salida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(salida)
+    print(salida)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
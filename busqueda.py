@@ -0,0 +1,167 @@
+from sqlmodel import Session, select, or_
+from sqlalchemy import text, func, literal_column, table, column
+from typing import List, Optional
+from models import Auto, Venta
+import re
+
+# Búsqueda de texto sobre marca/modelo/descripcion y nombre_comprador.
+# PostgreSQL: índices GIN pg_trgm (sirven a ILIKE '%x%') y tsvector para el ranking.
+# SQLite: tablas FTS5 con tokenizador trigram sincronizadas por triggers.
+
+_DOCUMENTO_AUTO = (
+    "to_tsvector('spanish', coalesce(auto.marca, '') || ' ' || "
+    "coalesce(auto.modelo, '') || ' ' || coalesce(auto.descripcion, ''))"
+)
+
+DDL_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_auto_marca_trgm ON auto USING gin (marca gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_auto_modelo_trgm ON auto USING gin (modelo gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_auto_descripcion_trgm ON auto USING gin (descripcion gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_venta_comprador_trgm ON venta USING gin (nombre_comprador gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS ix_auto_busqueda_tsv ON auto USING gin ({_DOCUMENTO_AUTO})",
+]
+
+DDL_SQLITE = {
+    "auto_fts": [
+        "CREATE VIRTUAL TABLE auto_fts USING fts5(marca, modelo, descripcion, "
+        "content='auto', content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER auto_fts_ai AFTER INSERT ON auto BEGIN "
+        "INSERT INTO auto_fts(rowid, marca, modelo, descripcion) "
+        "VALUES (new.id, new.marca, new.modelo, new.descripcion); END",
+        "CREATE TRIGGER auto_fts_ad AFTER DELETE ON auto BEGIN "
+        "INSERT INTO auto_fts(auto_fts, rowid, marca, modelo, descripcion) "
+        "VALUES ('delete', old.id, old.marca, old.modelo, old.descripcion); END",
+        "CREATE TRIGGER auto_fts_au AFTER UPDATE OF marca, modelo, descripcion ON auto BEGIN "
+        "INSERT INTO auto_fts(auto_fts, rowid, marca, modelo, descripcion) "
+        "VALUES ('delete', old.id, old.marca, old.modelo, old.descripcion); "
+        "INSERT INTO auto_fts(rowid, marca, modelo, descripcion) "
+        "VALUES (new.id, new.marca, new.modelo, new.descripcion); END",
+        "INSERT INTO auto_fts(auto_fts) VALUES ('rebuild')",
+    ],
+    "venta_fts": [
+        "CREATE VIRTUAL TABLE venta_fts USING fts5(nombre_comprador, "
+        "content='venta', content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER venta_fts_ai AFTER INSERT ON venta BEGIN "
+        "INSERT INTO venta_fts(rowid, nombre_comprador) VALUES (new.id, new.nombre_comprador); END",
+        "CREATE TRIGGER venta_fts_ad AFTER DELETE ON venta BEGIN "
+        "INSERT INTO venta_fts(venta_fts, rowid, nombre_comprador) "
+        "VALUES ('delete', old.id, old.nombre_comprador); END",
+        "CREATE TRIGGER venta_fts_au AFTER UPDATE OF nombre_comprador ON venta BEGIN "
+        "INSERT INTO venta_fts(venta_fts, rowid, nombre_comprador) "
+        "VALUES ('delete', old.id, old.nombre_comprador); "
+        "INSERT INTO venta_fts(rowid, nombre_comprador) VALUES (new.id, new.nombre_comprador); END",
+        "INSERT INTO venta_fts(venta_fts) VALUES ('rebuild')",
+    ],
+}
+
+_auto_fts = table("auto_fts", column("rowid"))
+_venta_fts = table("venta_fts", column("rowid"))
+
+def crear_indices_busqueda(conn):
+    """Crea los índices de búsqueda de texto si todavía no existen
+
+    Recibe la conexión de la transacción que crea el esquema.
+    """
+    if conn.dialect.name == "postgresql":
+        for sentencia in DDL_POSTGRES:
+            conn.execute(text(sentencia))
+    elif conn.dialect.name == "sqlite":
+        for tabla, sentencias in DDL_SQLITE.items():
+            existe = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :tabla"), {"tabla": tabla}
+            ).first()
+            if not existe:
+                for sentencia in sentencias:
+                    conn.execute(text(sentencia))
+
+def _terminos(texto: str) -> List[str]:
+    return [t for t in re.split(r"\s+", texto.strip()) if t]
+
+def _consulta_fts(terminos: List[str], columna: Optional[str] = None) -> Optional[str]:
+    """Expresión MATCH de FTS5; None si algún término es muy corto para trigramas"""
+    if not terminos or any(len(t) < 3 for t in terminos):
+        return None
+    prefijo = f"{columna} : " if columna else ""
+    return " AND ".join(prefijo + '"' + t.replace('"', '""') + '"' for t in terminos)
+
+def _dialecto(session: Session) -> str:
+    return session.get_bind().dialect.name
+
+def buscar_autos(session: Session, texto: str, skip: int = 0, limit: int = 100) -> List[Auto]:
+    """Autos que coinciden con el texto, ordenados por relevancia"""
+    terminos = _terminos(texto)
+    if not terminos:
+        return []
+    dialecto = _dialecto(session)
+    statement = select(Auto)
+    if dialecto == "postgresql":
+        consulta = func.websearch_to_tsquery(literal_column("'spanish'::regconfig"), texto)
+        documento = literal_column(_DOCUMENTO_AUTO)
+        relevancia = func.greatest(
+            func.ts_rank(documento, consulta),
+            func.similarity(Auto.marca, texto),
+            func.similarity(Auto.modelo, texto),
+        )
+        statement = statement.where(or_(
+            documento.op("@@")(consulta),
+            *[columna.ilike(f"%{t}%") for t in terminos for columna in (Auto.marca, Auto.modelo, Auto.descripcion)],
+        )).order_by(relevancia.desc(), Auto.id)
+    elif dialecto == "sqlite" and _consulta_fts(terminos):
+        statement = (
+            statement.join(_auto_fts, _auto_fts.c.rowid == Auto.id)
+            .where(text("auto_fts MATCH :consulta").bindparams(consulta=_consulta_fts(terminos)))
+            .order_by(text("bm25(auto_fts)"), Auto.id)
+        )
+    else:
+        for t in terminos:
+            statement = statement.where(or_(
+                Auto.marca.ilike(f"%{t}%"),
+                Auto.modelo.ilike(f"%{t}%"),
+                Auto.descripcion.ilike(f"%{t}%"),
+            ))
+        statement = statement.order_by(Auto.id)
+    return session.exec(statement.offset(skip).limit(limit)).all()
+
+def condiciones_marca_modelo(session: Session, marca: str = None, modelo: str = None) -> list:
+    """Condiciones WHERE de subcadena sobre marca/modelo con el índice de texto disponible"""
+    if _dialecto(session) == "sqlite":
+        filtros = [(c, v.strip()) for c, v in (("marca", marca), ("modelo", modelo)) if v and v.strip()]
+        consultas = [_consulta_fts([valor], columna) for columna, valor in filtros]
+        if filtros and all(consultas):
+            ids = text("SELECT rowid FROM auto_fts WHERE auto_fts MATCH :consulta").bindparams(
+                consulta=" AND ".join(consultas)
+            )
+            return [Auto.id.in_(ids)]
+    condiciones = []
+    if marca:
+        condiciones.append(Auto.marca.ilike(f"%{marca}%"))
+    if modelo:
+        condiciones.append(Auto.modelo.ilike(f"%{modelo}%"))
+    return condiciones
+
+def filtrar_autos(session: Session, marca: str = None, modelo: str = None, skip: int = 0, limit: int = 100,
+                  columnas: Optional[list] = None) -> List[Auto]:
+    """Filtro por subcadena de marca/modelo usando el índice de texto disponible"""
+    statement = (select(*columnas) if columnas else select(Auto)).where(*condiciones_marca_modelo(session, marca, modelo))
+    return session.exec(statement.order_by(Auto.id).offset(skip).limit(limit)).all()
+
+def buscar_ventas_por_comprador(session: Session, nombre: str, skip: int = 0, limit: int = 100,
+                                columnas: Optional[list] = None) -> List[Venta]:
+    """Ventas cuyo comprador contiene el nombre, las más relevantes primero"""
+    statement = select(*columnas) if columnas else select(Venta)
+    dialecto = _dialecto(session)
+    consulta = _consulta_fts([nombre.strip()]) if nombre.strip() else None
+    if dialecto == "sqlite" and consulta:
+        statement = (
+            statement.join(_venta_fts, _venta_fts.c.rowid == Venta.id)
+            .where(text("venta_fts MATCH :consulta").bindparams(consulta=consulta))
+            .order_by(text("bm25(venta_fts)"), Venta.id)
+        )
+    else:
+        statement = statement.where(Venta.nombre_comprador.ilike(f"%{nombre}%"))
+        if dialecto == "postgresql":
+            statement = statement.order_by(func.similarity(Venta.nombre_comprador, nombre).desc(), Venta.id)
+        else:
+            statement = statement.order_by(Venta.id)
+    return session.exec(statement.offset(skip).limit(limit)).all()
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+import hashlib
+import os
+import threading
+import time
+import models
+
+# Tamaño máximo (0 desactiva la caché) y vida de las entradas en segundos
+AUTO_CACHE_MAX_ITEMS = int(os.getenv("AUTO_CACHE_MAX_ITEMS", "10000"))
+AUTO_CACHE_TTL = float(os.getenv("AUTO_CACHE_TTL", "60"))
+
+class EntradaCache:
+    """Respuesta ya serializada junto con su ETag"""
+    __slots__ = ("cuerpo", "etag", "expira")
+
+    def __init__(self, cuerpo: bytes, expira: float):
+        self.cuerpo = cuerpo
+        self.etag = '"' + hashlib.sha1(cuerpo).hexdigest()[:20] + '"'
+        self.expira = expira
+
+class CacheLRU:
+    """Caché en memoria acotada, con TTL y desalojo LRU
+
+    Cada invalidación avanza `generacion`; una carga que empezó antes de una
+    invalidación no guarda su resultado, que puede ser anterior a la escritura.
+    """
+
+    def __init__(self, max_items: int, ttl: float):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._datos: "OrderedDict[Hashable, EntradaCache]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.desalojos = 0
+        self.expiradas = 0
+        self.invalidaciones = 0
+        self.descartadas = 0
+        self.generacion = 0
+
+    def get(self, clave: Hashable) -> Optional[EntradaCache]:
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+            if entrada.expira < time.monotonic():
+                del self._datos[clave]
+                self.expiradas += 1
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return entrada
+
+    def set(self, clave: Hashable, cuerpo: bytes, generacion: Optional[int] = None) -> EntradaCache:
+        """Guarda el cuerpo; con `generacion`, solo si no hubo invalidaciones desde entonces"""
+        entrada = EntradaCache(cuerpo, time.monotonic() + self.ttl)
+        if self.max_items <= 0:
+            return entrada
+        with self._lock:
+            if generacion is not None and generacion != self.generacion:
+                self.descartadas += 1
+                return entrada
+            self._datos[clave] = entrada
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_items:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+        return entrada
+
+    def obtener(self, clave: Hashable, cargar: Callable[[], Optional[bytes]]) -> Optional[EntradaCache]:
+        """Lectura a través de la caché: si no está, se carga y se guarda"""
+        generacion = self.generacion
+        entrada = self.get(clave)
+        if entrada is not None:
+            return entrada
+        cuerpo = cargar()
+        if cuerpo is None:
+            return None
+        return self.set(clave, cuerpo, generacion)
+
+    def invalidar(self, *claves: Hashable):
+        with self._lock:
+            self.generacion += 1
+            for clave in claves:
+                if self._datos.pop(clave, None) is not None:
+                    self.invalidaciones += 1
+
+    def limpiar(self):
+        with self._lock:
+            self.generacion += 1
+            self._datos.clear()
+
+    def estadisticas(self) -> dict:
+        consultas = self.hits + self.misses
+        return {
+            "items": len(self._datos),
+            "max_items": self.max_items,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / consultas, 4) if consultas else 0.0,
+            "desalojos": self.desalojos,
+            "expiradas": self.expiradas,
+            "invalidaciones": self.invalidaciones,
+            "descartadas": self.descartadas,
+        }
+
+auto_cache = CacheLRU(AUTO_CACHE_MAX_ITEMS, AUTO_CACHE_TTL)
+
+def serializar_auto(auto) -> Optional[bytes]:
+    if auto is None:
+        return None
+    return models.AutoResponse.from_orm(auto).json().encode("utf-8")
+
+def invalidar_auto(auto):
+    """Quita un auto de la caché por id y por número de chasis"""
+    auto_cache.invalidar(("id", auto.id), ("chasis", auto.numero_chasis))
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+from database import get_async_read_session
+from repository_async import AsyncCambioRepository
+import models
+
+router = APIRouter(prefix="/cambios", tags=["Cambios"])
+
+@router.get("/", response_model=List[models.CambioResponse])
+async def listar_cambios(
+    response: Response,
+    desde_secuencia: int = Query(0, ge=0, description="Último id ya procesado"),
+    limit: int = Query(500, ge=1, le=5000),
+    tabla: Optional[models.TablaCambio] = Query(None),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Cambios de autos y ventas posteriores a una secuencia, en orden
+
+    Para sincronizar de forma incremental se vuelve a pedir con
+    `desde_secuencia` igual al encabezado `X-Ultima-Secuencia`.
+    """
+    repo = AsyncCambioRepository(session)
+    cambios = await repo.desde_secuencia(desde_secuencia, limit, tabla.value if tabla else None)
+    response.headers["X-Ultima-Secuencia"] = str(cambios[-1].id if cambios else desde_secuencia)
+    return cambios
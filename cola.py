@@ -0,0 +1,162 @@
+from sqlmodel import Session
+from typing import Callable, Dict, List, Optional, Type
+from pydantic import BaseModel
+from database import engine
+from repository import TrabajoRepository
+import asyncio
+import json
+import os
+
+# Cola de trabajos en segundo plano respaldada por la tabla `trabajo`: cualquier
+# proceso encola con un INSERT (dentro de su transacción) y los workers de cada
+# proceso los reclaman con un UPDATE atómico, así que varios procesos pueden
+# consumir la misma cola sin tomar dos veces el mismo trabajo.
+
+# Ejecutar workers en este proceso (false en los procesos que solo sirven la API)
+TRABAJOS_WORKER = os.getenv("TRABAJOS_WORKER", "true").lower() in ("1", "true", "yes")
+
+# Trabajos simultáneos por proceso
+TRABAJOS_CONCURRENCIA = int(os.getenv("TRABAJOS_CONCURRENCIA", "2"))
+
+# Cada cuánto se revisa la tabla cuando nadie avisó de trabajos nuevos
+TRABAJOS_POLL_SEGUNDOS = float(os.getenv("TRABAJOS_POLL_SEGUNDOS", "1"))
+
+# Tiempo tras el cual un trabajo "en_curso" se considera abandonado y se retoma
+TRABAJOS_LEASE_SEGUNDOS = float(os.getenv("TRABAJOS_LEASE_SEGUNDOS", "600"))
+
+# Espera antes del primer reintento; se duplica en cada intento fallido
+TRABAJOS_REINTENTO_SEGUNDOS = float(os.getenv("TRABAJOS_REINTENTO_SEGUNDOS", "5"))
+
+class Tarea:
+    """Función registrada para un tipo de trabajo"""
+    __slots__ = ("nombre", "funcion", "concurrencia", "publica", "parametros")
+
+    def __init__(self, nombre: str, funcion: Callable, concurrencia: Optional[int],
+                 publica: bool, parametros: Optional[Type[BaseModel]]):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.concurrencia = concurrencia
+        self.publica = publica
+        self.parametros = parametros
+
+TAREAS: Dict[str, Tarea] = {}
+
+def tarea(nombre: str, concurrencia: Optional[int] = None, publica: bool = False,
+          parametros: Optional[Type[BaseModel]] = None):
+    """Registra `funcion(session, parametros) -> resultado` como tipo de trabajo
+
+    `concurrencia` limita cuántos de este tipo corren a la vez en el proceso;
+    `publica` permite encolarla desde POST /trabajos, validando el cuerpo con
+    el modelo `parametros`. El resultado tiene que poder pasarse a JSON.
+    """
+    def registrar(funcion: Callable) -> Callable:
+        TAREAS[nombre] = Tarea(nombre, funcion, concurrencia, publica, parametros)
+        return funcion
+    return registrar
+
+class ColaTrabajos:
+    def __init__(self, concurrencia: int = TRABAJOS_CONCURRENCIA):
+        self.concurrencia = concurrencia
+        self._workers: List[asyncio.Task] = []
+        self._aviso: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._en_curso: Dict[str, int] = {}
+        self.completados = 0
+        self.reintentos = 0
+        self.fallidos = 0
+
+    @property
+    def activa(self) -> bool:
+        return bool(self._workers)
+
+    async def iniciar(self):
+        if self._workers:
+            return
+        self._aviso = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrencia)]
+
+    async def detener(self):
+        """Cancela los workers; un trabajo a medio ejecutar se retoma al vencer su lease"""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def despertar(self):
+        """Avisa que hay trabajos nuevos para no esperar al próximo sondeo"""
+        if self._aviso is not None:
+            self._aviso.set()
+
+    def estadisticas(self) -> dict:
+        return {
+            "activa": self.activa,
+            "workers": len(self._workers),
+            "en_curso": {tipo: cantidad for tipo, cantidad in self._en_curso.items() if cantidad},
+            "completados": self.completados,
+            "reintentos": self.reintentos,
+            "fallidos": self.fallidos,
+        }
+
+    async def _worker(self):
+        while True:
+            self._aviso.clear()
+            trabajo = await self._tomar()
+            if trabajo is None:
+                try:
+                    await asyncio.wait_for(self._aviso.wait(), TRABAJOS_POLL_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await asyncio.to_thread(self._ejecutar, trabajo)
+            except Exception:
+                # La base no respondió al cerrar el trabajo: se retoma al vencer el lease
+                await asyncio.sleep(TRABAJOS_POLL_SEGUNDOS)
+            finally:
+                self._en_curso[trabajo.tipo] -= 1
+
+    async def _tomar(self):
+        """Reclama el próximo trabajo cuyo tipo no llegó a su límite de concurrencia"""
+        async with self._lock:
+            excluidos = [
+                nombre for nombre, registrada in TAREAS.items()
+                if registrada.concurrencia and self._en_curso.get(nombre, 0) >= registrada.concurrencia
+            ]
+            try:
+                trabajo = await asyncio.to_thread(self._reclamar, excluidos)
+            except Exception:
+                return None
+            if trabajo is not None:
+                self._en_curso[trabajo.tipo] = self._en_curso.get(trabajo.tipo, 0) + 1
+            return trabajo
+
+    def _reclamar(self, excluidos: List[str]):
+        with Session(engine) as session:
+            return TrabajoRepository(session).reclamar(excluidos, TRABAJOS_LEASE_SEGUNDOS)
+
+    def _ejecutar(self, trabajo):
+        """Corre la tarea en un hilo; sus escrituras se confirman junto con el estado final"""
+        with Session(engine) as session:
+            repo = TrabajoRepository(session)
+            registrada = TAREAS.get(trabajo.tipo)
+            if registrada is None:
+                repo.fallar(trabajo.id, f"Tipo de trabajo desconocido: {trabajo.tipo}", reintentar=False)
+                self.fallidos += 1
+                return
+            try:
+                resultado = registrada.funcion(session, json.loads(trabajo.parametros))
+            except Exception as e:
+                session.rollback()
+                reintentar = trabajo.intentos < trabajo.max_intentos
+                espera = TRABAJOS_REINTENTO_SEGUNDOS * 2 ** (trabajo.intentos - 1)
+                repo.fallar(trabajo.id, f"{type(e).__name__}: {e}", reintentar, espera)
+                if reintentar:
+                    self.reintentos += 1
+                else:
+                    self.fallidos += 1
+                return
+            repo.completar(trabajo.id, resultado)
+            self.completados += 1
+
+cola = ColaTrabajos()
@@ -0,0 +1,130 @@
+from starlette.datastructures import Headers, MutableHeaders
+from typing import Optional
+import brotli
+import os
+import zlib
+
+# Respuestas más chicas que esto (bytes) se envían sin comprimir
+COMPRESION_MIN_BYTES = int(os.getenv("COMPRESION_MIN_BYTES", "1024"))
+COMPRESION_GZIP_NIVEL = int(os.getenv("COMPRESION_GZIP_NIVEL", "6"))
+COMPRESION_BROTLI_CALIDAD = int(os.getenv("COMPRESION_BROTLI_CALIDAD", "4"))
+
+# Tipos de contenido que vale la pena comprimir
+TIPOS_COMPRIMIBLES = ("application/json", "application/x-ndjson", "text/")
+
+# Codificaciones soportadas, en orden de preferencia ante igual calidad
+CODIFICACIONES = ("br", "gzip")
+
+def elegir_codificacion(accept_encoding: str) -> Optional[str]:
+    """Codificación preferida por el cliente según Accept-Encoding (q-values)"""
+    calidades = {}
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                calidad = float(parametros[2:])
+            except ValueError:
+                calidad = 0.0
+        if nombre:
+            calidades[nombre.strip()] = calidad
+    comodin = calidades.get("*", 0.0)
+    elegida, mejor = None, 0.0
+    for codificacion in CODIFICACIONES:
+        calidad = calidades.get(codificacion, comodin)
+        if calidad > mejor:
+            elegida, mejor = codificacion, calidad
+    return elegida
+
+class _Brotli:
+    def __init__(self):
+        self._compresor = brotli.Compressor(quality=COMPRESION_BROTLI_CALIDAD)
+
+    def comprimir(self, datos: bytes) -> bytes:
+        return self._compresor.process(datos)
+
+    def vaciar(self) -> bytes:
+        return self._compresor.flush()
+
+    def terminar(self) -> bytes:
+        return self._compresor.finish()
+
+class _Gzip:
+    def __init__(self):
+        self._compresor = zlib.compressobj(COMPRESION_GZIP_NIVEL, zlib.DEFLATED, 31)
+
+    def comprimir(self, datos: bytes) -> bytes:
+        return self._compresor.compress(datos)
+
+    def vaciar(self) -> bytes:
+        return self._compresor.flush(zlib.Z_SYNC_FLUSH)
+
+    def terminar(self) -> bytes:
+        return self._compresor.flush()
+
+_COMPRESORES = {"br": _Brotli, "gzip": _Gzip}
+
+def _comprimible(headers: Headers) -> bool:
+    tipo = headers.get("content-type", "")
+    return "content-encoding" not in headers and tipo.startswith(TIPOS_COMPRIMIBLES)
+
+class CompresionMiddleware:
+    """Middleware ASGI: brotli o gzip negociado con Accept-Encoding
+
+    Comprime los tipos de texto/JSON de al menos COMPRESION_MIN_BYTES y las
+    respuestas en streaming (exportaciones) bloque a bloque. Los ETag fuertes
+    pasan a débiles, porque los bytes enviados ya no son los del recurso.
+    """
+
+    def __init__(self, app, minimo: int = COMPRESION_MIN_BYTES):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding", ""))
+        inicio = None
+        compresor = None
+        pasar = False
+
+        async def enviar(mensaje):
+            nonlocal inicio, compresor, pasar
+            if mensaje["type"] == "http.response.start":
+                inicio = mensaje
+                return
+            if mensaje["type"] != "http.response.body" or pasar:
+                await send(mensaje)
+                return
+            cuerpo = mensaje.get("body", b"")
+            mas = mensaje.get("more_body", False)
+            if compresor is None:
+                headers = MutableHeaders(raw=list(inicio.get("headers", [])))
+                comprimible = _comprimible(headers)
+                if comprimible:
+                    headers.add_vary_header("Accept-Encoding")
+                if not comprimible or not codificacion or (not mas and len(cuerpo) < self.minimo):
+                    pasar = True
+                    await send({**inicio, "headers": headers.raw})
+                    await send(mensaje)
+                    return
+                compresor = _COMPRESORES[codificacion]()
+                headers["Content-Encoding"] = codificacion
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                if mas:
+                    del headers["Content-Length"]
+                else:
+                    cuerpo = compresor.comprimir(cuerpo) + compresor.terminar()
+                    headers["Content-Length"] = str(len(cuerpo))
+                    await send({**inicio, "headers": headers.raw})
+                    await send({"type": "http.response.body", "body": cuerpo})
+                    return
+                await send({**inicio, "headers": headers.raw})
+            cuerpo = compresor.comprimir(cuerpo) + (compresor.vaciar() if mas else compresor.terminar())
+            await send({"type": "http.response.body", "body": cuerpo, "more_body": mas})
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,93 @@
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Dict, Optional, Tuple
+from database import async_engine
+from models import VersionTabla
+import hashlib
+import os
+import time
+
+# ETags débiles de los listados a partir de la versión de cada tabla, que se
+# incrementa en la misma transacción que cada escritura. Un If-None-Match se
+# responde con 304 comparando contra las versiones que el proceso tiene en
+# memoria, sin abrir una sesión.
+
+# Segundos que un proceso reutiliza las versiones leídas; acota cuánto tarda en
+# notar escrituras hechas por otros procesos (las propias las nota enseguida)
+VERSIONES_TTL = float(os.getenv("VERSIONES_TTL", "1"))
+
+# Cache-Control de los listados: el cliente o la CDN guardan la respuesta y la
+# revalidan con If-None-Match
+CACHE_CONTROL_LISTADOS = os.getenv("CACHE_CONTROL_LISTADOS", "public, max-age=0, must-revalidate")
+
+class VersionesTablas:
+    """Copia en memoria de la tabla de versiones, con TTL"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._versiones: Dict[str, int] = {}
+        self._expira = 0.0
+        self._generacion = 0
+        self.lecturas = 0
+
+    def invalidar(self):
+        """Después de una escritura confirmada en este proceso"""
+        self._generacion += 1
+        self._expira = 0.0
+
+    async def actuales(self) -> Dict[str, int]:
+        if time.monotonic() >= self._expira:
+            generacion = self._generacion
+            async with async_engine.connect() as conn:
+                resultado = await conn.execute(select(VersionTabla.tabla, VersionTabla.version))
+                self._versiones = dict(resultado.all())
+            self.lecturas += 1
+            # Si hubo una escritura mientras se leía, la próxima vez se vuelve a leer
+            if generacion == self._generacion:
+                self._expira = time.monotonic() + self.ttl
+        return self._versiones
+
+    def estadisticas(self) -> dict:
+        return {"ttl": self.ttl, "lecturas": self.lecturas, "versiones": dict(self._versiones)}
+
+versiones = VersionesTablas(VERSIONES_TTL)
+
+def _debil(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+def coincide(request: Request, etag: str) -> bool:
+    """Comparación débil de If-None-Match contra `etag`"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _debil(etag) in {_debil(valor.strip()) for valor in if_none_match.split(",")}
+
+def etag(request: Request, actuales: Dict[str, int], tablas: Tuple[str, ...]) -> str:
+    """Versión de las tablas que lee el listado más la URL pedida"""
+    url = f"{request.url.path}?{request.url.query}"
+    firma = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    return 'W/"' + ".".join(str(actuales.get(tabla, 0)) for tabla in tablas) + "-" + firma + '"'
+
+async def no_modificado(request: Request, tablas: Tuple[str, ...]) -> Optional[Response]:
+    """304 si el ETag del cliente coincide con las versiones actuales"""
+    if "if-none-match" not in request.headers:
+        return None
+    actual = etag(request, await versiones.actuales(), tablas)
+    if coincide(request, actual):
+        return Response(status_code=304, headers={"ETag": actual, "Cache-Control": CACHE_CONTROL_LISTADOS})
+    return None
+
+async def encabezados(request: Request, session: AsyncSession, tablas: Tuple[str, ...]) -> dict:
+    """ETag y Cache-Control de un listado
+
+    Las versiones se leen en la sesión del request antes que los datos: si la
+    réplica está atrasada, el ETag queda viejo (y el cliente vuelve a pedir)
+    en lugar de asociar datos viejos a una versión nueva.
+    """
+    resultado = await session.execute(
+        select(VersionTabla.tabla, VersionTabla.version).where(VersionTabla.tabla.in_(tablas))
+    )
+    return {"ETag": etag(request, dict(resultado.all()), tablas), "Cache-Control": CACHE_CONTROL_LISTADOS}
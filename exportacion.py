@@ -0,0 +1,96 @@
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import AsyncIterator, Optional
+from datetime import datetime
+from enum import Enum
+from database import async_engine
+from models import Auto, Venta, AutoResponse, VentaResponse
+import csv
+import io
+import json
+import os
+
+# Filas que se traen por vuelta del cursor del servidor
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+class FormatoExportacion(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+MEDIA_TYPES = {
+    FormatoExportacion.NDJSON: "application/x-ndjson",
+    FormatoExportacion.CSV: "text/csv",
+}
+
+COLUMNAS_AUTO = list(AutoResponse.__fields__)
+COLUMNAS_VENTA = list(VentaResponse.__fields__)
+
+def sentencia_autos(desde: Optional[datetime] = None, hasta: Optional[datetime] = None, estado: Optional[str] = None):
+    statement = select(*[getattr(Auto, columna) for columna in COLUMNAS_AUTO])
+    if desde:
+        statement = statement.where(Auto.fecha_ingreso >= desde)
+    if hasta:
+        statement = statement.where(Auto.fecha_ingreso <= hasta)
+    if estado:
+        statement = statement.where(Auto.estado == estado)
+    return statement.order_by(Auto.id)
+
+def sentencia_ventas(desde: Optional[datetime] = None, hasta: Optional[datetime] = None):
+    statement = select(*[getattr(Venta, columna) for columna in COLUMNAS_VENTA])
+    if desde:
+        statement = statement.where(Venta.fecha_venta >= desde)
+    if hasta:
+        statement = statement.where(Venta.fecha_venta <= hasta)
+    return statement.order_by(Venta.id)
+
+def _valor_json(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(f"No serializable: {type(valor).__name__}")
+
+def _ndjson(columnas, filas) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(columnas, fila)), default=_valor_json, ensure_ascii=False) + "\n"
+        for fila in filas
+    ).encode("utf-8")
+
+def _csv(filas) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        [valor.isoformat() if isinstance(valor, datetime) else valor for valor in fila]
+        for fila in filas
+    )
+    return buffer.getvalue().encode("utf-8")
+
+async def generar(statement, columnas, formato: FormatoExportacion, motor=None) -> AsyncIterator[bytes]:
+    """Recorre el resultado con un cursor del servidor y lo emite por lotes
+
+    Usa su propia sesión para no depender de la sesión del request, que puede
+    cerrarse antes de terminar de enviar la respuesta. `motor` permite leer
+    de una réplica; por defecto, el primario.
+    """
+    async with AsyncSession(motor or async_engine) as session:
+        resultado = await session.stream(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if formato == FormatoExportacion.CSV:
+            yield _csv([columnas])
+        async for filas in resultado.partitions():
+            if formato == FormatoExportacion.CSV:
+                yield _csv(filas)
+            else:
+                yield _ndjson(columnas, filas)
+
+def escribir_archivo(session, statement, columnas, formato: FormatoExportacion, ruta: str) -> int:
+    """Versión síncrona de `generar` que vuelca la exportación a un archivo
+
+    La usan los trabajos en segundo plano; devuelve la cantidad de filas.
+    """
+    filas_escritas = 0
+    resultado = session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    with open(ruta, "wb") as archivo:
+        if formato == FormatoExportacion.CSV:
+            archivo.write(_csv([columnas]))
+        for filas in resultado.partitions():
+            archivo.write(_csv(filas) if formato == FormatoExportacion.CSV else _ndjson(columnas, filas))
+            filas_escritas += len(filas)
+    return filas_escritas
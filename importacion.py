@@ -0,0 +1,120 @@
+from pydantic import ValidationError
+from typing import AsyncIterator, List, Tuple
+import csv
+import io
+import json
+import os
+import tempfile
+import models
+
+# Tamaño de lote para los INSERT multi-fila de la importación masiva
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+
+# Bytes de un CSV que se guardan en memoria antes de pasar a un archivo temporal
+CSV_BUFFER_MEMORIA_BYTES = int(os.getenv("CSV_BUFFER_MEMORIA_BYTES", str(8 * 1024 * 1024)))
+
+FORMATOS = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "text/csv": "csv",
+}
+
+def mensaje_validacion(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(parte) for parte in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+async def _lineas(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Parte el cuerpo en líneas a medida que llega, sin cargarlo completo"""
+    pendiente = b""
+    async for chunk in stream:
+        pendiente += chunk
+        *lineas, pendiente = pendiente.split(b"\n")
+        for linea in lineas:
+            yield linea.decode("utf-8").rstrip("\r")
+    if pendiente:
+        yield pendiente.decode("utf-8").rstrip("\r")
+
+async def _filas_json(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    cuerpo = b"".join([chunk async for chunk in stream])
+    datos = json.loads(cuerpo)
+    if not isinstance(datos, list):
+        raise ValueError("Se esperaba un arreglo JSON de autos")
+    for numero, fila in enumerate(datos, start=1):
+        yield numero, fila
+
+async def _filas_ndjson(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    numero = 0
+    async for linea in _lineas(stream):
+        if not linea.strip():
+            continue
+        numero += 1
+        try:
+            yield numero, json.loads(linea)
+        except ValueError as e:
+            yield numero, e
+
+async def _filas_csv(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    """Filas del CSV leídas por un único csv.reader
+
+    El cuerpo se guarda en un archivo temporal (en memoria hasta
+    CSV_BUFFER_MEMORIA_BYTES) y el módulo csv decide dónde termina cada
+    registro, así los campos entre comillas pueden tener saltos de línea.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=CSV_BUFFER_MEMORIA_BYTES) as buffer:
+        async for chunk in stream:
+            buffer.write(chunk)
+        buffer.seek(0)
+        texto = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+        try:
+            encabezado = None
+            numero = 0
+            for valores in csv.reader(texto):
+                if not valores or (len(valores) == 1 and not valores[0].strip()):
+                    continue
+                if encabezado is None:
+                    encabezado = [campo.strip() for campo in valores]
+                    continue
+                numero += 1
+                if len(valores) != len(encabezado):
+                    yield numero, ValueError(f"Se esperaban {len(encabezado)} columnas y llegaron {len(valores)}")
+                    continue
+                yield numero, {campo: (valor if valor != "" else None) for campo, valor in zip(encabezado, valores)}
+        finally:
+            # Soltar el buffer sin cerrarlo: lo cierra el with
+            texto.detach()
+
+def leer_filas(formato: str, stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    return {"json": _filas_json, "ndjson": _filas_ndjson, "csv": _filas_csv}[formato](stream)
+
+async def importar_autos(repo, filas: AsyncIterator[Tuple[int, object]]) -> dict:
+    """Valida cada fila y la inserta en lotes; los errores se informan por fila"""
+    insertados = 0
+    errores: List[dict] = []
+    lote: List[Tuple[int, models.AutoCreate]] = []
+
+    async def _volcar():
+        nonlocal insertados
+        cantidad, errores_lote = await repo.bulk_create(lote)
+        insertados += cantidad
+        errores.extend(errores_lote)
+        lote.clear()
+
+    async for numero, datos in filas:
+        if isinstance(datos, Exception):
+            errores.append({"fila": numero, "error": str(datos)})
+            continue
+        if not isinstance(datos, dict):
+            errores.append({"fila": numero, "error": "La fila debe ser un objeto"})
+            continue
+        try:
+            lote.append((numero, models.AutoCreate(**datos)))
+        except ValidationError as e:
+            errores.append({"fila": numero, "error": mensaje_validacion(e)})
+        if len(lote) >= BULK_BATCH_SIZE:
+            await _volcar()
+    if lote:
+        await _volcar()
+    errores.sort(key=lambda e: e["fila"])
+    return {"insertados": insertados, "errores": errores}
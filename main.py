@@ -1,16 +1,56 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 from sqlmodel import Session
-from database import create_db_and_tables, get_session
-from repository import AutoRepository, VentaRepository
+from sqlalchemy import text
+from typing import List, Optional
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncEngine
+from database import (
+    bloqueo_esquema, create_db_and_tables, get_read_session, engine, async_engine, async_replica_engines,
+    estadisticas_pool, ESTADISTICAS_RESUMEN, DB_INIT_EN_STARTUP,
+)
+from repository import EstadisticasRepository, ResumenRepository
+from cache import auto_cache
+from metricas import MetricasMiddleware, registro
+from compresion import CompresionMiddleware
+from cola import cola, TRABAJOS_WORKER
 import autos
 import ventas
+import trabajos
+import cambios
+import tareas  # registra las tareas de la cola
+import asyncio
+import etags
 import models
+import os
+
+# Tiempo máximo de cada verificación de /ready, en segundos
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "2"))
+
+def preparar_base():
+    """Esquema, índices y tablas de resumen; una vez por despliegue
+
+    Todo corre en una sola transacción con el lock de bloqueo_esquema(), así
+    los procesos que arrancan a la vez no reconstruyen los resúmenes en paralelo.
+    """
+    with bloqueo_esquema() as conn:
+        create_db_and_tables(conn)
+        if ESTADISTICAS_RESUMEN:
+            with Session(bind=conn) as session:
+                ResumenRepository(session).reconstruir()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    if DB_INIT_EN_STARTUP:
+        preparar_base()
+    if TRABAJOS_WORKER:
+        await cola.iniciar()
+    app.state.listo = True
     yield
+    app.state.listo = False
+    await cola.detener()
 
 app = FastAPI(
     title="API Concesionaria de Autos - UTN",
@@ -19,9 +59,14 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+app.add_middleware(CompresionMiddleware)
+app.add_middleware(MetricasMiddleware)
+
 # Incluir routers
 app.include_router(autos.router)
 app.include_router(ventas.router)
+app.include_router(trabajos.router)
+app.include_router(cambios.router)
 
 @app.get("/")
 def root():
@@ -31,42 +76,121 @@ def root():
 def health_check():
     return {"status": "healthy", "version": "2.0.0"}
 
+def _ping_sync(motor):
+    with motor.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+async def _ping_async(motor):
+    async with motor.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+async def _verificar(motor, pool: dict) -> str:
+    if pool.get("max_overflow", -1) >= 0 and pool["checked_out"] >= pool["size"] + pool["max_overflow"]:
+        return "pool saturado"
+    try:
+        if isinstance(motor, AsyncEngine):
+            await asyncio.wait_for(_ping_async(motor), READY_TIMEOUT)
+        else:
+            await asyncio.wait_for(run_in_threadpool(_ping_sync, motor), READY_TIMEOUT)
+        return "ok"
+    except Exception as e:
+        return f"error: {type(e).__name__}"
+
+@app.get("/ready")
+async def readiness_check():
+    """Listo para recibir tráfico: arranque terminado, base accesible y pools con lugar
+
+    A diferencia de /health (proceso vivo) devuelve 503 si alguna verificación del
+    primario falla. Las réplicas se informan pero no sacan al proceso de servicio.
+    """
+    pools = estadisticas_pool()
+    verificaciones = {"arranque": "ok" if getattr(app.state, "listo", False) else "pendiente"}
+    for nombre, motor in (("sync", engine), ("async", async_engine)):
+        verificaciones[f"db_{nombre}"] = await _verificar(motor, pools[nombre])
+    listo = all(valor == "ok" for valor in verificaciones.values())
+    replicas = {}
+    for i, motor in enumerate(async_replica_engines):
+        replicas[f"replica_{i}"] = await _verificar(motor, pools[f"replica_{i}_async"])
+    return JSONResponse(
+        {"status": "ready" if listo else "not_ready", "checks": verificaciones, "replicas": replicas},
+        status_code=200 if listo else 503,
+    )
+
+@app.get("/health/pool")
+def pool_status():
+    """Estado del pool de conexiones (en uso, overflow, tiempos de espera)"""
+    return estadisticas_pool()
+
+@app.get("/health/cache")
+def cache_status():
+    """Aciertos, fallos y desalojos de la caché de autos, y versiones de tablas de los ETags"""
+    return {**auto_cache.estadisticas(), "etags": etags.versiones.estadisticas()}
+
+@app.get("/health/trabajos")
+def trabajos_status():
+    """Workers de la cola de este proceso y trabajos completados, reintentados y fallidos"""
+    return cola.estadisticas()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    """Métricas en formato Prometheus: latencia por ruta, consultas y pool"""
+    return PlainTextResponse(registro.prometheus(estadisticas_pool()), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/slow-queries")
+def slow_queries():
+    """Últimas consultas lentas con la ruta que las originó"""
+    return list(registro.consultas_lentas)
+
 
 @app.get("/estadisticas", response_model=models.EstadisticasResponse, tags=["Estadísticas"])
-def obtener_estadisticas(session: Session = Depends(get_session)):
+def obtener_estadisticas(session: Session = Depends(get_read_session)):
     """Obtener estadísticas generales de la concesionaria"""
-    auto_repo = AutoRepository(session)
-    venta_repo = VentaRepository(session)
-    
-    # Obtener todos los autos para cálculos
-    autos = auto_repo.get_all(limit=1000)  # Número alto para obtener todos
-    
-    total_autos = len(autos)
-    autos_disponibles = len([auto for auto in autos if auto.estado == "disponible"])
-    autos_vendidos = len([auto for auto in autos if auto.estado == "vendido"])
-    
-    # Valor del inventario (autos disponibles)
-    valor_inventario = sum(auto.precio for auto in autos if auto.estado == "disponible")
-    
-    # Ingresos totales (precio de venta de autos vendidos)
-    # Para esto necesitamos las ventas reales
-    todas_ventas = venta_repo.get_all(limit=1000)
-    ingresos_totales = sum(venta.precio for venta in todas_ventas)
-    
-    # Marca más popular
-    from collections import Counter
-    marcas = [auto.marca for auto in autos]
-    marca_counter = Counter(marcas)
-    marca_mas_popular = marca_counter.most_common(1)[0][0] if marca_counter else "N/A"
-    
-    return {
-        "total_autos": total_autos,
-        "autos_disponibles": autos_disponibles,
-        "autos_vendidos": autos_vendidos,
-        "valor_inventario": valor_inventario,
-        "ingresos_totales": ingresos_totales,
-        "marca_mas_popular": marca_mas_popular
-    }
+    return EstadisticasRepository(session).obtener_resumen()
+
+@app.get("/estadisticas/ventas", response_model=List[models.AnaliticaVentasFila], tags=["Estadísticas"])
+def analitica_ventas(
+    periodo: models.PeriodoVentas = Query(models.PeriodoVentas.MES),
+    desde: Optional[date] = Query(None, description="Primer día incluido"),
+    hasta: Optional[date] = Query(None, description="Último día incluido"),
+    por_marca: bool = Query(False),
+    por_modelo: bool = Query(False),
+    marca: Optional[str] = Query(None),
+    session: Session = Depends(get_read_session)
+):
+    """Ventas agrupadas por día, semana o mes, opcionalmente por marca y modelo"""
+    return EstadisticasRepository(session).obtener_analitica_ventas(
+        periodo.value, desde, hasta, por_marca, por_modelo, marca
+    )
+
+@app.get("/estadisticas/inventario", response_model=List[models.AntiguedadInventarioFila], tags=["Estadísticas"])
+def antiguedad_inventario(
+    por_marca: bool = Query(False),
+    por_modelo: bool = Query(False),
+    por_anio: bool = Query(False),
+    marca: Optional[str] = Query(None),
+    estado: List[models.EstadoAuto] = Query([], description="Por defecto, todo el stock (no vendidos)"),
+    session: Session = Depends(get_read_session)
+):
+    """Valor del stock por banda de días desde el ingreso, opcionalmente por marca, modelo y año"""
+    return EstadisticasRepository(session).obtener_antiguedad_inventario(
+        por_marca, por_modelo, por_anio, marca, [valor.value for valor in estado]
+    )
+
+@app.get("/estadisticas/rotacion", response_model=List[models.RotacionVentasFila], tags=["Estadísticas"])
+def rotacion_ventas(
+    periodo: models.PeriodoVentas = Query(models.PeriodoVentas.TOTAL),
+    desde: Optional[date] = Query(None, description="Primer día de venta incluido"),
+    hasta: Optional[date] = Query(None, description="Último día de venta incluido"),
+    por_marca: bool = Query(False),
+    por_modelo: bool = Query(False),
+    por_anio: bool = Query(False),
+    marca: Optional[str] = Query(None),
+    session: Session = Depends(get_read_session)
+):
+    """Días promedio entre el ingreso y la venta de los autos vendidos"""
+    return EstadisticasRepository(session).obtener_rotacion_ventas(
+        periodo.value, desde, hasta, por_marca, por_modelo, por_anio, marca
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,178 @@
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+import os
+import threading
+import time
+
+# Consultas más lentas que esto (ms) se guardan como muestra junto a su ruta
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_MUESTRAS = int(os.getenv("SLOW_QUERY_MUESTRAS", "100"))
+
+# Límites de los buckets del histograma de latencia, en segundos
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class MedicionRequest:
+    """Acumula consultas, tiempo de base y espera de pool de un request"""
+    __slots__ = ("scope", "consultas", "tiempo_db", "espera_pool")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.espera_pool = 0.0
+
+_medicion: ContextVar[Optional[MedicionRequest]] = ContextVar("medicion_request", default=None)
+
+class _Ruta:
+    __slots__ = ("buckets", "cantidad", "suma", "consultas", "tiempo_db", "espera_pool", "por_codigo")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.cantidad = 0
+        self.suma = 0.0
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.espera_pool = 0.0
+        self.por_codigo = {}
+
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rutas = {}
+        self.consultas_lentas = deque(maxlen=SLOW_QUERY_MUESTRAS)
+
+    def observar(self, ruta: tuple, codigo: int, duracion: float, medicion: MedicionRequest):
+        with self._lock:
+            datos = self.rutas.get(ruta)
+            if datos is None:
+                datos = self.rutas[ruta] = _Ruta()
+            for i, limite in enumerate(BUCKETS):
+                if duracion <= limite:
+                    datos.buckets[i] += 1
+            datos.cantidad += 1
+            datos.suma += duracion
+            datos.consultas += medicion.consultas
+            datos.tiempo_db += medicion.tiempo_db
+            datos.espera_pool += medicion.espera_pool
+            clase = f"{codigo // 100}xx"
+            datos.por_codigo[clase] = datos.por_codigo.get(clase, 0) + 1
+
+    def consulta_lenta(self, ruta: Optional[tuple], duracion: float, sql: str):
+        self.consultas_lentas.append({
+            "ruta": " ".join(ruta) if ruta else None,
+            "ms": round(duracion * 1000, 3),
+            "sql": sql[:1000],
+            "cuando": time.time(),
+        })
+
+    def prometheus(self, pools: dict) -> str:
+        """Exposición en formato de texto de Prometheus"""
+        lineas = [
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            rutas = sorted(self.rutas.items())
+            for (metodo, ruta), datos in rutas:
+                etiquetas = f'method="{metodo}",route="{ruta}"'
+                for limite, cantidad in zip(BUCKETS, datos.buckets):
+                    lineas.append(f'http_request_duration_seconds_bucket{{{etiquetas},le="{limite}"}} {cantidad}')
+                lineas.append(f'http_request_duration_seconds_bucket{{{etiquetas},le="+Inf"}} {datos.cantidad}')
+                lineas.append(f"http_request_duration_seconds_sum{{{etiquetas}}} {datos.suma:.6f}")
+                lineas.append(f"http_request_duration_seconds_count{{{etiquetas}}} {datos.cantidad}")
+            lineas.append("# TYPE http_requests_total counter")
+            for (metodo, ruta), datos in rutas:
+                for clase, cantidad in sorted(datos.por_codigo.items()):
+                    lineas.append(f'http_requests_total{{method="{metodo}",route="{ruta}",status="{clase}"}} {cantidad}')
+            for nombre, atributo, formato in (
+                ("db_queries_total", "consultas", "{}"),
+                ("db_query_seconds_total", "tiempo_db", "{:.6f}"),
+                ("db_pool_wait_seconds_total", "espera_pool", "{:.6f}"),
+            ):
+                lineas.append(f"# TYPE {nombre} counter")
+                for (metodo, ruta), datos in rutas:
+                    valor = formato.format(getattr(datos, atributo))
+                    lineas.append(f'{nombre}{{method="{metodo}",route="{ruta}"}} {valor}')
+        for metrica, clave in (
+            ("db_pool_checked_out", "checked_out"),
+            ("db_pool_overflow", "overflow"),
+            ("db_pool_timeouts_total", "timeouts"),
+            ("db_pool_wait_seconds_max", "espera_maxima_ms"),
+        ):
+            lineas.append(f"# TYPE {metrica} gauge")
+            for motor, estadisticas in pools.items():
+                if clave in estadisticas:
+                    valor = estadisticas[clave]
+                    if clave.endswith("_ms"):
+                        valor = valor / 1000
+                    lineas.append(f'{metrica}{{engine="{motor}"}} {valor}')
+        return "\n".join(lineas) + "\n"
+
+registro = Registro()
+
+_rutas_por_endpoint = {}
+
+def ruta_de(scope) -> tuple:
+    """(método, plantilla de ruta) del endpoint que atendió el request"""
+    app = scope.get("app")
+    rutas = _rutas_por_endpoint.get(id(app))
+    if rutas is None:
+        rutas = _rutas_por_endpoint[id(app)] = {
+            getattr(ruta, "endpoint", None): ruta.path for ruta in getattr(app, "routes", [])
+        }
+    return (scope.get("method", ""), rutas.get(scope.get("endpoint"), "sin_ruta"))
+
+def registrar_espera_pool(segundos: float):
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion.espera_pool += segundos
+
+def instrumentar_engine(engine):
+    """Cuenta y cronometra cada sentencia ejecutada por el motor"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        duracion = time.perf_counter() - conn.info["inicio_consulta"].pop()
+        medicion = _medicion.get()
+        if medicion is not None:
+            medicion.consultas += 1
+            medicion.tiempo_db += duracion
+        if duracion * 1000 >= SLOW_QUERY_MS:
+            registro.consulta_lenta(ruta_de(medicion.scope) if medicion else None, duracion, statement)
+
+class MetricasMiddleware:
+    """Middleware ASGI: latencia por ruta, consultas por request y Server-Timing"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        medicion = MedicionRequest(scope)
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        codigo = 500
+
+        async def enviar(mensaje):
+            nonlocal codigo
+            if mensaje["type"] == "http.response.start":
+                codigo = mensaje["status"]
+                total = (time.perf_counter() - inicio) * 1000
+                timing = (
+                    f'db;dur={medicion.tiempo_db * 1000:.2f};desc="{medicion.consultas} consultas", '
+                    f"pool;dur={medicion.espera_pool * 1000:.2f}, app;dur={total:.2f}"
+                )
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicion.reset(token)
+            registro.observar(ruta_de(scope), codigo, time.perf_counter() - inicio, medicion)
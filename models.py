@@ -1,11 +1,17 @@
 from sqlmodel import SQLModel, Field, Relationship
-from typing import Optional, List
+from sqlalchemy import Index
+from typing import Dict, Optional, List
 from enum import Enum
-from datetime import datetime
-from pydantic import BaseModel, validator
+from datetime import date, datetime
+from pydantic import BaseModel, root_validator, validator
 from datetime import timedelta 
+import json
+import os
 import re
 
+# Máximo de ids o números de chasis por consulta en lote
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
 # Zona horaria Argentina
 def hora_argentina():
     return datetime.utcnow() - timedelta(hours=3)
@@ -30,6 +36,16 @@ class VentaBase(SQLModel):
 
 # Modelos de Tabla con Relaciones
 class Auto(AutoBase, table=True):
+    __table_args__ = (
+        Index("ix_auto_fecha_ingreso_id", "fecha_ingreso", "id"),
+        # Formas de filtro habituales del catálogo: estado fijo más un rango o un conjunto
+        Index("ix_auto_estado_precio_id", "estado", "precio", "id"),
+        Index("ix_auto_estado_anio_id", "estado", "anio", "id"),
+        Index("ix_auto_estado_kilometraje_id", "estado", "kilometraje", "id"),
+        Index("ix_auto_estado_combustible_precio", "estado", "tipo_combustible", "precio"),
+        Index("ix_auto_estado_marca_precio", "estado", "marca", "precio"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     estado: str = Field(default="disponible")
     fecha_ingreso: datetime = Field(default_factory=hora_argentina)
@@ -38,12 +54,89 @@ class Auto(AutoBase, table=True):
     ventas: List["Venta"] = Relationship(back_populates="auto")
 
 class Venta(VentaBase, table=True):
+    __table_args__ = (
+        Index("ix_venta_fecha_venta_id", "fecha_venta", "id"),
+        Index("ix_venta_auto_id_fecha_venta", "auto_id", "fecha_venta"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     auto_id: int = Field(foreign_key="auto.id")
     
     # Relación muchos-a-uno con Auto
     auto: Auto = Relationship(back_populates="ventas")
 
+# Rollup diario de ventas por marca/modelo para la analítica de ventas
+class RollupVentasDia(SQLModel, table=True):
+    dia: date = Field(primary_key=True)
+    marca: str = Field(primary_key=True)
+    modelo: str = Field(primary_key=True)
+    cantidad: int = Field(default=0)
+    total: float = Field(default=0)
+    minimo: Optional[float] = None
+    maximo: Optional[float] = None
+
+# Autos en stock (no vendidos) por día de ingreso, para la antigüedad del inventario
+class RollupInventarioIngreso(SQLModel, table=True):
+    dia_ingreso: date = Field(primary_key=True)
+    marca: str = Field(primary_key=True)
+    modelo: str = Field(primary_key=True)
+    anio: int = Field(primary_key=True)
+    estado: str = Field(primary_key=True)
+    cantidad: int = Field(default=0)
+    valor: float = Field(default=0)
+
+# Días entre el ingreso y la venta, por día de venta y marca/modelo/año
+class RollupRotacionDia(SQLModel, table=True):
+    dia: date = Field(primary_key=True)
+    marca: str = Field(primary_key=True)
+    modelo: str = Field(primary_key=True)
+    anio: int = Field(primary_key=True)
+    cantidad: int = Field(default=0)
+    dias_total: float = Field(default=0)
+
+# Registro de cambios de autos y ventas; solo se agregan filas y `id` es la secuencia
+class Cambio(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_cambio_tabla_registro_fecha", "tabla", "registro_id", "fecha"),
+        Index("ix_cambio_fecha_id", "fecha", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    tabla: str
+    registro_id: int
+    operacion: str
+    datos: str = Field(default="{}")
+    fecha: datetime = Field(default_factory=hora_argentina)
+
+# Versión de cada tabla, incrementada en cada escritura (ETags de los listados)
+class VersionTabla(SQLModel, table=True):
+    tabla: str = Field(primary_key=True)
+    version: int = Field(default=0)
+
+# Claves de idempotencia de POST /ventas/ (reintentos del cliente)
+class IdempotenciaVenta(SQLModel, table=True):
+    clave: str = Field(primary_key=True)
+    venta_id: int = Field(foreign_key="venta.id")
+    fecha: datetime = Field(default_factory=hora_argentina)
+
+# Cola de trabajos en segundo plano (efectos posteriores a una venta, reportes)
+class Trabajo(SQLModel, table=True):
+    __table_args__ = (Index("ix_trabajo_estado_disponible_id", "estado", "disponible_desde", "id"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    tipo: str = Field(index=True)
+    clave: Optional[str] = Field(default=None, unique=True)
+    estado: str = Field(default="pendiente")
+    parametros: str = Field(default="{}")
+    resultado: Optional[str] = None
+    error: Optional[str] = None
+    intentos: int = Field(default=0)
+    max_intentos: int = Field(default=3)
+    creado: datetime = Field(default_factory=hora_argentina)
+    disponible_desde: datetime = Field(default_factory=hora_argentina)
+    iniciado: Optional[datetime] = None
+    terminado: Optional[datetime] = None
+
 # Modelos para Creación
 class AutoCreate(AutoBase):
     @validator('numero_chasis')
@@ -83,6 +176,12 @@ class AutoUpdate(BaseModel):
     imagen_url: Optional[str] = None
     estado: Optional[str] = None
 
+    @validator('estado')
+    def estado_valido(cls, v):
+        if v is not None and v not in {estado.value for estado in EstadoAuto}:
+            raise ValueError(f"Estado inválido; valores permitidos: {', '.join(e.value for e in EstadoAuto)}")
+        return v
+
 class VentaUpdate(BaseModel):
     nombre_comprador: Optional[str] = None
     precio: Optional[float] = None
@@ -109,6 +208,89 @@ class AutoResponseWithVentas(AutoResponse):
 class VentaResponseWithAuto(VentaResponse):
     auto: AutoResponse
 
+class FiltrosAuto(BaseModel):
+    marca: Optional[str] = None
+    modelo: Optional[str] = None
+    precio_min: Optional[float] = None
+    precio_max: Optional[float] = None
+    anio_min: Optional[int] = None
+    anio_max: Optional[int] = None
+    kilometraje_min: Optional[float] = None
+    kilometraje_max: Optional[float] = None
+    color: List[str] = []
+    tipo_combustible: List[str] = []
+    estado: List[str] = []
+
+class CatalogoAutosResponse(BaseModel):
+    total: int
+    items: List[AutoResponse]
+    facetas: Dict[str, Dict[str, int]]
+
+class LoteIdsRequest(BaseModel):
+    ids: List[int] = Field(..., min_items=1, max_items=BATCH_MAX_ITEMS)
+
+class LoteChasisRequest(BaseModel):
+    chasis: List[str] = Field(..., min_items=1, max_items=BATCH_MAX_ITEMS)
+
+# Un elemento por clave pedida, en el mismo orden; encontrado=False si no existe
+class LoteAutoItem(BaseModel):
+    clave: str
+    encontrado: bool
+    auto: Optional[AutoResponse] = None
+
+class LoteVentaItem(BaseModel):
+    clave: str
+    encontrado: bool
+    venta: Optional[VentaResponse] = None
+
+class TrabajoCreate(BaseModel):
+    tipo: str
+    parametros: dict = {}
+    max_intentos: int = Field(3, ge=1, le=10)
+
+class TrabajoResponse(SQLModel):
+    id: int
+    tipo: str
+    estado: str
+    intentos: int
+    max_intentos: int
+    error: Optional[str] = None
+    creado: datetime
+    iniciado: Optional[datetime] = None
+    terminado: Optional[datetime] = None
+
+class CambioResponse(SQLModel):
+    id: int
+    tabla: str
+    registro_id: int
+    operacion: str
+    datos: dict
+    fecha: datetime
+
+    @validator('datos', pre=True)
+    def datos_json(cls, v):
+        return json.loads(v) if isinstance(v, str) else v
+
+class ErrorImportacion(BaseModel):
+    fila: int
+    error: str
+
+class ImportacionResponse(BaseModel):
+    insertados: int
+    errores: List[ErrorImportacion] = []
+
+# Tablas de resumen mantenidas incrementalmente por los repositorios
+class ResumenInventario(SQLModel, table=True):
+    marca: str = Field(primary_key=True)
+    estado: str = Field(primary_key=True)
+    cantidad: int = Field(default=0)
+    valor: float = Field(default=0)
+
+class ResumenVentas(SQLModel, table=True):
+    id: int = Field(default=1, primary_key=True)
+    total_ventas: int = Field(default=0)
+    ingresos_totales: float = Field(default=0)
+
 # Enums para estados y combustibles
 class EstadoAuto(str, Enum):
     DISPONIBLE = "disponible"
@@ -116,6 +298,42 @@ class EstadoAuto(str, Enum):
     RESERVADO = "reservado"
     MANTENIMIENTO = "mantenimiento"
 
+class OperacionCambio(str, Enum):
+    ALTA = "alta"
+    MODIFICACION = "modificacion"
+    BAJA = "baja"
+
+class TablaCambio(str, Enum):
+    AUTO = "auto"
+    VENTA = "venta"
+
+class EstadoTrabajo(str, Enum):
+    PENDIENTE = "pendiente"
+    EN_CURSO = "en_curso"
+    COMPLETADO = "completado"
+    FALLIDO = "fallido"
+
+class OrdenAutos(str, Enum):
+    ID = "id"
+    FECHA_INGRESO = "fecha_ingreso"
+    MARCA = "marca"
+    MODELO = "modelo"
+    ANIO = "anio"
+    PRECIO = "precio"
+    KILOMETRAJE = "kilometraje"
+    COLOR = "color"
+    TIPO_COMBUSTIBLE = "tipo_combustible"
+
+class OrdenVentas(str, Enum):
+    ID = "id"
+    FECHA_VENTA = "fecha_venta"
+
+class PeriodoVentas(str, Enum):
+    DIA = "dia"
+    SEMANA = "semana"
+    MES = "mes"
+    TOTAL = "total"
+
 class TipoCombustible(str, Enum):
     GASOLINA = "gasolina"
     DIESEL = "diesel"
@@ -131,4 +349,62 @@ class EstadisticasResponse(BaseModel):
     autos_vendidos: int
     valor_inventario: float
     ingresos_totales: float
-    marca_mas_popular: str
\ No newline at end of file
+    marca_mas_popular: str
+
+class AnaliticaVentasFila(BaseModel):
+    periodo: Optional[str] = None
+    marca: Optional[str] = None
+    modelo: Optional[str] = None
+    cantidad: int
+    total: float
+    promedio: float
+    minimo: Optional[float] = None
+    maximo: Optional[float] = None
+
+class AntiguedadInventarioFila(BaseModel):
+    marca: Optional[str] = None
+    modelo: Optional[str] = None
+    anio: Optional[int] = None
+    banda: str
+    cantidad: int
+    valor: float
+    dias_promedio: float
+
+class RotacionVentasFila(BaseModel):
+    periodo: Optional[str] = None
+    marca: Optional[str] = None
+    modelo: Optional[str] = None
+    anio: Optional[int] = None
+    cantidad: int
+    dias_promedio: float
+
+class CriterioAutos(BaseModel):
+    ids: List[int] = Field([], max_items=BATCH_MAX_ITEMS)
+    marca: Optional[str] = None
+    modelo: Optional[str] = None
+    anio_min: Optional[int] = None
+    anio_max: Optional[int] = None
+    estado: List[EstadoAuto] = []
+
+    @root_validator
+    def algun_criterio(cls, values):
+        if not any(values.get(campo) not in (None, []) for campo in cls.__fields__):
+            raise ValueError("Indicar ids o al menos un filtro")
+        return values
+
+class ActualizacionMasivaAutos(BaseModel):
+    criterio: CriterioAutos
+    cambios: AutoUpdate = AutoUpdate()
+    porcentaje_precio: Optional[float] = Field(None, gt=-100, description="-10 baja 10% el precio")
+
+    @root_validator(skip_on_failure=True)
+    def cambios_validos(cls, values):
+        cambios, porcentaje = values.get("cambios"), values.get("porcentaje_precio")
+        if cambios.precio is not None and porcentaje is not None:
+            raise ValueError("Usar precio o porcentaje_precio, no ambos")
+        if not cambios.dict(exclude_none=True) and porcentaje is None:
+            raise ValueError("No hay cambios para aplicar")
+        return values
+
+class ActualizacionMasivaResponse(BaseModel):
+    actualizados: int
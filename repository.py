@@ -1,9 +1,137 @@
-from sqlmodel import Session, select, func
-from typing import List, Optional
-from models import Auto, AutoCreate, AutoUpdate, Venta, VentaCreate, VentaUpdate
+from sqlmodel import Session, select, func, delete, or_
+from sqlalchemy import DateTime, text, Numeric, cast, extract, insert, update, literal_column, literal, case, union_all
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List, Optional, Tuple
+from models import (
+    Auto, AutoCreate, AutoUpdate, Venta, VentaCreate, VentaUpdate,
+    ResumenInventario, ResumenVentas, RollupVentasDia, RollupInventarioIngreso, RollupRotacionDia,
+    IdempotenciaVenta, VersionTabla, Cambio, FiltrosAuto, CriterioAutos,
+    Trabajo, hora_argentina,
+)
+from database import ESTADISTICAS_RESUMEN, CAMBIOS_LOCK_ID
+import busqueda
+import cache
+import etags
+import base64
 import datetime
+import json
+import os
 import re
 
+# Límites superiores de las bandas de precio de las facetas del catálogo
+FACETA_PRECIO_BANDAS = [
+    float(limite) for limite in os.getenv("FACETA_PRECIO_BANDAS", "10000,20000,30000,50000").split(",")
+]
+_BANDAS_PRECIO = [
+    (limite, f"<{limite:g}" if i == 0 else f"{FACETA_PRECIO_BANDAS[i - 1]:g}-{limite:g}")
+    for i, limite in enumerate(FACETA_PRECIO_BANDAS)
+]
+_BANDA_PRECIO_MAYOR = f">={FACETA_PRECIO_BANDAS[-1]:g}"
+
+# Límites (en días desde el ingreso) de las bandas de antigüedad del stock
+ANTIGUEDAD_BANDAS_DIAS = [int(limite) for limite in os.getenv("ANTIGUEDAD_BANDAS_DIAS", "30,60,90,180,365").split(",")]
+_BANDAS_ANTIGUEDAD = [
+    f"0-{limite}" if i == 0 else f"{ANTIGUEDAD_BANDAS_DIAS[i - 1] + 1}-{limite}"
+    for i, limite in enumerate(ANTIGUEDAD_BANDAS_DIAS)
+] + [f">{ANTIGUEDAD_BANDAS_DIAS[-1]}"]
+
+def codificar_cursor(orden: str, valor, ultimo_id: int) -> str:
+    """Cursor opaco con la posición del último elemento de la página"""
+    if isinstance(valor, datetime.datetime):
+        valor = valor.isoformat()
+    crudo = json.dumps([orden, valor, ultimo_id]).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+# Tipos JSON aceptados en el valor del cursor según la columna de orden
+_TIPOS_CURSOR = {
+    "id": (int,),
+    "anio": (int,),
+    "precio": (int, float),
+    "kilometraje": (int, float),
+    "marca": (str,),
+    "modelo": (str,),
+    "color": (str,),
+    "tipo_combustible": (str,),
+}
+
+def _es_de_tipo(valor, tipos: tuple) -> bool:
+    return isinstance(valor, tipos) and not isinstance(valor, bool)
+
+def _valor_cursor(columna: str, valor):
+    """Valida el valor del cursor para la columna y lo convierte si hace falta"""
+    if columna == "id" and valor is None:
+        # El orden por id solo usa el último id
+        return None
+    if columna.startswith("fecha_"):
+        return datetime.datetime.fromisoformat(valor)
+    if columna not in _TIPOS_CURSOR or not _es_de_tipo(valor, _TIPOS_CURSOR[columna]):
+        raise ValueError("Cursor inválido")
+    return valor
+
+def decodificar_cursor(cursor: str, orden: str) -> Tuple[object, int]:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        orden_cursor, valor, ultimo_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if orden_cursor == orden:
+            valor = _valor_cursor(orden.lstrip("-"), valor)
+            if not _es_de_tipo(ultimo_id, (int,)):
+                raise ValueError("Cursor inválido")
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+    if orden_cursor != orden:
+        raise ValueError("El cursor no corresponde al orden solicitado")
+    return valor, ultimo_id
+
+def paginar_keyset(session: Session, modelo, orden: str, cursor: Optional[str], limit: int,
+                   condiciones: tuple = (), descendente: bool = False, columnas: Optional[list] = None):
+    """Página ordenada por (orden, id) a partir del cursor, sin OFFSET
+
+    `condiciones` filtra las filas; con `descendente` el recorrido va de
+    mayor a menor y el cursor queda atado a esa dirección. Con `columnas`
+    las filas son tuplas de esas columnas (deben incluir `orden` e `id`).
+    """
+    columna = getattr(modelo, orden)
+    clave = f"-{orden}" if descendente else orden
+    statement = _seleccion(modelo, columnas).where(*condiciones)
+    if cursor:
+        valor, ultimo_id = decodificar_cursor(cursor, clave)
+        despues = modelo.id < ultimo_id if descendente else modelo.id > ultimo_id
+        if orden != "id":
+            pasada = columna < valor if descendente else columna > valor
+            despues = or_(pasada, (columna == valor) & despues)
+        statement = statement.where(despues)
+    direccion = (lambda c: c.desc()) if descendente else (lambda c: c.asc())
+    if orden == "id":
+        statement = statement.order_by(direccion(modelo.id))
+    else:
+        statement = statement.order_by(direccion(columna), direccion(modelo.id))
+    filas = session.exec(statement.limit(limit + 1)).all()
+    siguiente = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        if filas:
+            ultimo = filas[-1]
+            siguiente = codificar_cursor(clave, getattr(ultimo, orden), ultimo.id)
+    return filas, siguiente
+
+def _seleccion(modelo, columnas: Optional[list] = None):
+    """SELECT de instancias del modelo, o de tuplas si se piden columnas"""
+    return select(*columnas) if columnas else select(modelo)
+
+def _en_orden(session: Session, modelo, columna, claves: list) -> list:
+    """Filas cuya `columna` está en `claves`, alineadas con `claves` (None donde falta)"""
+    if not claves:
+        return []
+    encontrados = {
+        getattr(fila, columna.key): fila
+        for fila in session.exec(select(modelo).where(columna.in_(set(claves))))
+    }
+    return [encontrados.get(clave) for clave in claves]
+
+class AutoNoDisponibleError(ValueError):
+    """El auto ya fue vendido o no está en estado disponible"""
+
 class AutoRepository:
     def __init__(self, session: Session):
         self.session = session
@@ -11,33 +139,265 @@ class AutoRepository:
     def create(self, auto: AutoCreate) -> Auto:
         db_auto = Auto(**auto.dict())
         self.session.add(db_auto)
+        resumen = ResumenRepository(self.session)
+        resumen.agregar_auto(db_auto)
+        resumen.registrar_cambio("auto")
+        self.session.flush()
+        CambioRepository(self.session).registrar("auto", db_auto.id, "alta", db_auto.dict())
         self.session.commit()
+        etags.versiones.invalidar()
         self.session.refresh(db_auto)
         return db_auto
 
     def get_by_id(self, auto_id: int) -> Optional[Auto]:
         return self.session.get(Auto, auto_id)
 
-    def get_all(self, skip: int = 0, limit: int = 100) -> List[Auto]:
-        statement = select(Auto).offset(skip).limit(limit)
+    def bulk_create(self, filas: List[Tuple[int, AutoCreate]]) -> Tuple[int, List[dict]]:
+        """Inserta un lote de autos validados con un INSERT multi-fila
+
+        Los chasis repetidos se detectan con una sola consulta IN; si el lote
+        falla igual (p. ej. por una escritura concurrente) se reintenta fila
+        por fila para informar cuáles fallaron sin descartar el resto.
+        """
+        chasis = [auto.numero_chasis for _, auto in filas]
+        existentes = set(self.session.exec(
+            select(Auto.numero_chasis).where(Auto.numero_chasis.in_(chasis))
+        ).all())
+        errores = []
+        validas = []
+        ingreso = hora_argentina()
+        for numero, auto in filas:
+            if auto.numero_chasis in existentes:
+                errores.append({"fila": numero, "error": f"El chasis {auto.numero_chasis} ya existe"})
+                continue
+            existentes.add(auto.numero_chasis)
+            validas.append((numero, {**auto.dict(), "estado": "disponible", "fecha_ingreso": ingreso}))
+
+        insertadas = []
+        if validas:
+            try:
+                with self.session.begin_nested():
+                    ids = self.session.scalars(
+                        insert(Auto).returning(Auto.id, sort_by_parameter_order=True),
+                        [valores for _, valores in validas],
+                    ).all()
+                insertadas = [{**valores, "id": auto_id} for (_, valores), auto_id in zip(validas, ids)]
+            except IntegrityError:
+                for numero, valores in validas:
+                    try:
+                        with self.session.begin_nested():
+                            auto_id = self.session.scalars(insert(Auto).returning(Auto.id), [valores]).one()
+                        insertadas.append({**valores, "id": auto_id})
+                    except IntegrityError as e:
+                        errores.append({"fila": numero, "error": str(e.orig)})
+
+        resumen = ResumenRepository(self.session)
+        resumen.ajustar_autos(
+            (valores["marca"], valores["modelo"], valores["anio"], "disponible", valores["fecha_ingreso"], 1, valores["precio"])
+            for valores in insertadas
+        )
+        if insertadas:
+            resumen.registrar_cambio("auto")
+        CambioRepository(self.session).registrar_lote(
+            [("auto", valores["id"], "alta", valores) for valores in insertadas]
+        )
+        self.session.commit()
+        etags.versiones.invalidar()
+        return len(insertadas), errores
+
+    def get_by_id_with_ventas(self, auto_id: int) -> Optional[Auto]:
+        return self.session.get(Auto, auto_id, options=[selectinload(Auto.ventas)])
+
+    def get_all(self, skip: int = 0, limit: int = 100, columnas: Optional[list] = None) -> List[Auto]:
+        statement = _seleccion(Auto, columnas).order_by(Auto.id).offset(skip).limit(limit)
+        return self.session.exec(statement).all()
+
+    def get_all_with_ventas(self, skip: int = 0, limit: int = 100) -> List[Auto]:
+        """Autos con sus ventas en dos consultas (autos + un IN de ventas)"""
+        statement = (
+            select(Auto).options(selectinload(Auto.ventas))
+            .order_by(Auto.id).offset(skip).limit(limit)
+        )
         return self.session.exec(statement).all()
 
+    def get_page(self, cursor: Optional[str] = None, limit: int = 100, orden: str = "id") -> Tuple[List[Auto], Optional[str]]:
+        return paginar_keyset(self.session, Auto, orden, cursor, limit)
+
+    def _condiciones(self, filtros: FiltrosAuto) -> list:
+        condiciones = busqueda.condiciones_marca_modelo(self.session, filtros.marca, filtros.modelo)
+        for columna, minimo, maximo in (
+            (Auto.precio, filtros.precio_min, filtros.precio_max),
+            (Auto.anio, filtros.anio_min, filtros.anio_max),
+            (Auto.kilometraje, filtros.kilometraje_min, filtros.kilometraje_max),
+        ):
+            if minimo is not None:
+                condiciones.append(columna >= minimo)
+            if maximo is not None:
+                condiciones.append(columna <= maximo)
+        for columna, valores in (
+            (Auto.color, filtros.color),
+            (Auto.tipo_combustible, filtros.tipo_combustible),
+            (Auto.estado, filtros.estado),
+        ):
+            if valores:
+                condiciones.append(columna.in_(valores))
+        return condiciones
+
+    def filtrar(self, filtros: FiltrosAuto, cursor: Optional[str] = None, limit: int = 100,
+                orden: str = "id", descendente: bool = False,
+                columnas: Optional[list] = None) -> Tuple[List[Auto], Optional[str]]:
+        """Página de autos que cumplen todos los filtros, por cursor"""
+        return paginar_keyset(
+            self.session, Auto, orden, cursor, limit, tuple(self._condiciones(filtros)), descendente, columnas
+        )
+
+    def facetas(self, filtros: FiltrosAuto) -> Tuple[int, Dict[str, Dict[str, int]]]:
+        """Total y cantidad de autos por marca, combustible y banda de precio
+
+        Una sola sentencia: los conteos agrupados se calculan con UNION ALL
+        sobre el conjunto ya filtrado, no con una consulta por faceta.
+        """
+        filtrados = (
+            select(Auto.marca, Auto.tipo_combustible, Auto.precio)
+            .where(*self._condiciones(filtros))
+            .cte("filtrados")
+        )
+        banda = case(
+            *[(filtrados.c.precio < limite, etiqueta) for limite, etiqueta in _BANDAS_PRECIO],
+            else_=_BANDA_PRECIO_MAYOR,
+        )
+        statement = union_all(*[
+            select(literal(nombre).label("faceta"), expresion.label("valor"), func.count().label("cantidad"))
+            .select_from(filtrados)
+            .group_by(expresion)
+            for nombre, expresion in (
+                ("marca", filtrados.c.marca),
+                ("tipo_combustible", filtrados.c.tipo_combustible),
+                ("precio", banda),
+            )
+        ])
+        facetas = {"marca": {}, "tipo_combustible": {}, "precio": {}}
+        for faceta, valor, cantidad in self.session.execute(statement):
+            facetas[faceta][valor] = cantidad
+        return sum(facetas["marca"].values()), facetas
+
     def update(self, auto_id: int, auto_update: AutoUpdate) -> Optional[Auto]:
         db_auto = self.session.get(Auto, auto_id)
         if db_auto:
+            resumen = ResumenRepository(self.session)
+            resumen.quitar_auto(db_auto)
             update_data = auto_update.dict(exclude_unset=True)
+            diferencias = _diferencias(db_auto, update_data)
             for field, value in update_data.items():
                 setattr(db_auto, field, value)
             self.session.add(db_auto)
+            resumen.agregar_auto(db_auto)
+            resumen.registrar_cambio("auto")
+            if diferencias:
+                CambioRepository(self.session).registrar("auto", auto_id, "modificacion", diferencias)
             self.session.commit()
             self.session.refresh(db_auto)
+            cache.invalidar_auto(db_auto)
+            etags.versiones.invalidar()
         return db_auto
 
+    def update_many(self, criterio: CriterioAutos, auto_update: AutoUpdate,
+                    porcentaje_precio: Optional[float] = None) -> int:
+        """Aplica los cambios a todos los autos del criterio con un solo UPDATE
+
+        `porcentaje_precio` ajusta el precio relativo al actual (redondeado a
+        centavos). Los resúmenes de inventario se corrigen con el agregado por
+        marca/modelo/año/estado/día de ingreso de antes y de después, en la
+        misma transacción.
+        """
+        condiciones = []
+        if criterio.ids:
+            condiciones.append(Auto.id.in_(criterio.ids))
+        if criterio.marca:
+            condiciones.append(Auto.marca == criterio.marca)
+        if criterio.modelo:
+            condiciones.append(Auto.modelo == criterio.modelo)
+        if criterio.anio_min is not None:
+            condiciones.append(Auto.anio >= criterio.anio_min)
+        if criterio.anio_max is not None:
+            condiciones.append(Auto.anio <= criterio.anio_max)
+        if criterio.estado:
+            condiciones.append(Auto.estado.in_([estado.value for estado in criterio.estado]))
+
+        valores = auto_update.dict(exclude_unset=True, exclude_none=True)
+        if porcentaje_precio is not None:
+            valores["precio"] = func.round(cast(Auto.precio * (1 + porcentaje_precio / 100), Numeric), 2)
+
+        resumen = ResumenRepository(self.session)
+        if ESTADISTICAS_RESUMEN:
+            # FOR UPDATE bloquea las filas hasta el commit (PostgreSQL) para
+            # que el agregado previo coincida con lo que cambia el UPDATE
+            afectados = select(
+                Auto.marca, Auto.modelo, Auto.anio, Auto.estado, Auto.fecha_ingreso, Auto.precio
+            ).where(*condiciones).with_for_update().subquery()
+            claves = [
+                afectados.c.marca, afectados.c.modelo, afectados.c.anio, afectados.c.estado,
+                func.date(afectados.c.fecha_ingreso),
+            ]
+            previo = self.session.execute(
+                select(*claves, func.count(), func.sum(afectados.c.precio)).group_by(*claves)
+            ).all()
+            resumen.ajustar_autos(previo, signo=-1)
+
+        # Valores previos de las columnas que cambian, para el registro de cambios
+        campos = list(valores)
+        columnas = [getattr(Auto, campo) for campo in campos]
+        anteriores = {
+            auto_id: previos for auto_id, *previos in self.session.execute(
+                select(Auto.id, *columnas).where(*condiciones).with_for_update()
+            )
+        }
+
+        filas = self.session.execute(
+            update(Auto)
+            .where(*condiciones)
+            .values(**valores)
+            .returning(
+                Auto.id, Auto.numero_chasis, Auto.marca, Auto.modelo, Auto.anio,
+                Auto.estado, Auto.fecha_ingreso, Auto.precio, *columnas,
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+        resumen.ajustar_autos(
+            (marca, modelo, anio, estado, fecha_ingreso, 1, precio)
+            for _, _, marca, modelo, anio, estado, fecha_ingreso, precio, *_ in filas
+        )
+        if filas:
+            resumen.registrar_cambio("auto")
+        cambios = []
+        for auto_id, *fila in filas:
+            diferencias = {
+                campo: [anterior, nuevo]
+                for campo, anterior, nuevo in zip(campos, anteriores.get(auto_id, [None] * len(campos)), fila[7:])
+                if anterior != nuevo
+            }
+            if diferencias:
+                cambios.append(("auto", auto_id, "modificacion", diferencias))
+        CambioRepository(self.session).registrar_lote(cambios)
+        self.session.commit()
+        cache.auto_cache.invalidar(*[
+            clave for auto_id, numero_chasis, *_ in filas
+            for clave in (("id", auto_id), ("chasis", numero_chasis))
+        ])
+        etags.versiones.invalidar()
+        return len(filas)
+
     def delete(self, auto_id: int) -> bool:
         auto = self.session.get(Auto, auto_id)
         if auto:
             self.session.delete(auto)
+            resumen = ResumenRepository(self.session)
+            resumen.quitar_auto(auto)
+            resumen.registrar_cambio("auto")
+            CambioRepository(self.session).registrar("auto", auto_id, "baja", auto.dict())
             self.session.commit()
+            cache.invalidar_auto(auto)
+            etags.versiones.invalidar()
             return True
         return False
 
@@ -45,50 +405,148 @@ class AutoRepository:
         statement = select(Auto).where(Auto.numero_chasis == numero_chasis)
         return self.session.exec(statement).first()
 
-    def search_by_marca_modelo(self, marca: str = None, modelo: str = None) -> List[Auto]:
-        statement = select(Auto)
-        if marca:
-            statement = statement.where(Auto.marca.ilike(f"%{marca}%"))
-        if modelo:
-            statement = statement.where(Auto.modelo.ilike(f"%{modelo}%"))
-        return self.session.exec(statement).all()
+    def get_by_id_cached(self, auto_id: int) -> Optional[cache.EntradaCache]:
+        """Auto serializado, leído a través de la caché en memoria"""
+        return cache.auto_cache.obtener(
+            ("id", auto_id), lambda: cache.serializar_auto(self.get_by_id(auto_id))
+        )
+
+    def get_by_chasis_cached(self, numero_chasis: str) -> Optional[cache.EntradaCache]:
+        return cache.auto_cache.obtener(
+            ("chasis", numero_chasis), lambda: cache.serializar_auto(self.get_by_chasis(numero_chasis))
+        )
+
+    def get_many_by_ids(self, ids: List[int]) -> List[Optional[Auto]]:
+        """Autos de los ids pedidos con un solo IN, en el orden pedido (None si no existe)"""
+        return _en_orden(self.session, Auto, Auto.id, ids)
+
+    def get_many_by_chasis(self, numeros_chasis: List[str]) -> List[Optional[Auto]]:
+        return _en_orden(self.session, Auto, Auto.numero_chasis, numeros_chasis)
+
+    def search_by_marca_modelo(self, marca: str = None, modelo: str = None, skip: int = 0, limit: int = 100,
+                               columnas: Optional[list] = None) -> List[Auto]:
+        return busqueda.filtrar_autos(self.session, marca, modelo, skip, limit, columnas)
+
+    def buscar(self, texto: str, skip: int = 0, limit: int = 100) -> List[Auto]:
+        return busqueda.buscar_autos(self.session, texto, skip, limit)
 
 class VentaRepository:
     def __init__(self, session: Session):
         self.session = session
 
-    def create(self, venta: VentaCreate) -> Venta:
-        # Verificar que el auto existe
-        auto = self.session.get(Auto, venta.auto_id)
-        if not auto:
-            raise ValueError("Auto no encontrado")
-        
+    def create(self, venta: VentaCreate, idempotency_key: Optional[str] = None) -> Venta:
+        """Registra la venta y marca el auto como vendido en una sola transacción
+
+        El cambio de estado es un UPDATE condicional (solo si el auto sigue
+        "disponible"), así dos ventas concurrentes del mismo auto no pueden
+        confirmarse ambas. Con `idempotency_key` un reintento devuelve la
+        venta ya creada en lugar de registrar otra.
+        """
+        if idempotency_key:
+            existente = self._get_by_idempotency_key(idempotency_key)
+            if existente:
+                return existente
+
+        statement = (
+            update(Auto)
+            .where(Auto.id == venta.auto_id, Auto.estado == "disponible")
+            .values(estado="vendido")
+            .returning(Auto.marca, Auto.modelo, Auto.anio, Auto.precio, Auto.numero_chasis, Auto.fecha_ingreso)
+            .execution_options(synchronize_session=False)
+        )
+        reservado = self.session.execute(statement).first()
+        if not reservado:
+            self.session.rollback()
+            existente = self._get_by_idempotency_key(idempotency_key) if idempotency_key else None
+            if existente:
+                return existente
+            if not self.session.get(Auto, venta.auto_id):
+                raise ValueError("Auto no encontrado")
+            raise AutoNoDisponibleError("El auto no está disponible para la venta")
+        marca, modelo, anio, precio_auto, numero_chasis, fecha_ingreso = reservado
+
         db_venta = Venta(**venta.dict())
         self.session.add(db_venta)
-        
-        # Actualizar estado del auto a "vendido"
-        auto.estado = "vendido"
-        self.session.add(auto)
-        
-        self.session.commit()
+        self.session.flush()
+        if idempotency_key:
+            self.session.add(IdempotenciaVenta(clave=idempotency_key, venta_id=db_venta.id))
+
+        resumen = ResumenRepository(self.session)
+        resumen.ajustar_inventario(marca, "disponible", -1, -precio_auto)
+        resumen.ajustar_inventario(marca, "vendido", 1, precio_auto)
+        resumen.ajustar_antiguedad(fecha_ingreso, marca, modelo, anio, "disponible", -1, -precio_auto)
+        resumen.ajustar_ventas(1, db_venta.precio)
+        resumen.registrar_venta_rollup(db_venta.fecha_venta, marca, modelo, db_venta.precio)
+        resumen.ajustar_rotacion(db_venta.fecha_venta, fecha_ingreso, marca, modelo, anio, 1)
+        resumen.registrar_cambio("auto", "venta")
+        CambioRepository(self.session).registrar_lote([
+            ("venta", db_venta.id, "alta", db_venta.dict()),
+            ("auto", venta.auto_id, "modificacion", {"estado": ["disponible", "vendido"]}),
+        ])
+        # Los efectos posteriores (comprobante) se confirman junto con la venta
+        # y corren fuera del request
+        TrabajoRepository(self.session).encolar(
+            "comprobante_venta", {"venta_id": db_venta.id}, clave=f"comprobante_venta:{db_venta.id}"
+        )
+
+        try:
+            self.session.commit()
+        except IntegrityError:
+            # Otro request con la misma clave confirmó primero
+            self.session.rollback()
+            existente = self._get_by_idempotency_key(idempotency_key) if idempotency_key else None
+            if existente:
+                return existente
+            raise
         self.session.refresh(db_venta)
+        cache.auto_cache.invalidar(("id", venta.auto_id), ("chasis", numero_chasis))
+        etags.versiones.invalidar()
         return db_venta
 
+    def _get_by_idempotency_key(self, clave: str) -> Optional[Venta]:
+        statement = select(Venta).join(IdempotenciaVenta, IdempotenciaVenta.venta_id == Venta.id).where(
+            IdempotenciaVenta.clave == clave
+        )
+        return self.session.exec(statement).first()
+
     def get_by_id(self, venta_id: int) -> Optional[Venta]:
         return self.session.get(Venta, venta_id)
 
-    def get_all(self, skip: int = 0, limit: int = 100) -> List[Venta]:
-        statement = select(Venta).offset(skip).limit(limit)
+    def get_by_id_with_auto(self, venta_id: int) -> Optional[Venta]:
+        return self.session.get(Venta, venta_id, options=[joinedload(Venta.auto)])
+
+    def get_all(self, skip: int = 0, limit: int = 100, columnas: Optional[list] = None) -> List[Venta]:
+        statement = _seleccion(Venta, columnas).order_by(Venta.id).offset(skip).limit(limit)
         return self.session.exec(statement).all()
 
+    def get_page(self, cursor: Optional[str] = None, limit: int = 100, orden: str = "id",
+                 columnas: Optional[list] = None) -> Tuple[List[Venta], Optional[str]]:
+        return paginar_keyset(self.session, Venta, orden, cursor, limit, columnas=columnas)
+
+    def get_many_by_ids(self, ids: List[int]) -> List[Optional[Venta]]:
+        return _en_orden(self.session, Venta, Venta.id, ids)
+
     def update(self, venta_id: int, venta_update: VentaUpdate) -> Optional[Venta]:
         db_venta = self.session.get(Venta, venta_id)
         if db_venta:
+            precio_anterior = db_venta.precio
             update_data = venta_update.dict(exclude_unset=True)
+            diferencias = _diferencias(db_venta, update_data)
             for field, value in update_data.items():
                 setattr(db_venta, field, value)
             self.session.add(db_venta)
+            if db_venta.precio != precio_anterior:
+                resumen = ResumenRepository(self.session)
+                resumen.ajustar_ventas(0, db_venta.precio - precio_anterior)
+                auto = self.session.get(Auto, db_venta.auto_id)
+                resumen.ajustar_venta_rollup(
+                    db_venta.fecha_venta, auto.marca, auto.modelo, 0, precio_anterior, db_venta.precio
+                )
+            ResumenRepository(self.session).registrar_cambio("venta")
+            if diferencias:
+                CambioRepository(self.session).registrar("venta", venta_id, "modificacion", diferencias)
             self.session.commit()
+            etags.versiones.invalidar()
             self.session.refresh(db_venta)
         return db_venta
 
@@ -96,17 +554,25 @@ class VentaRepository:
         venta = self.session.get(Venta, venta_id)
         if venta:
             self.session.delete(venta)
+            resumen = ResumenRepository(self.session)
+            resumen.ajustar_ventas(-1, -venta.precio)
+            auto = self.session.get(Auto, venta.auto_id)
+            resumen.ajustar_venta_rollup(venta.fecha_venta, auto.marca, auto.modelo, -1, venta.precio, None)
+            resumen.ajustar_rotacion(venta.fecha_venta, auto.fecha_ingreso, auto.marca, auto.modelo, auto.anio, -1)
+            resumen.registrar_cambio("venta")
+            CambioRepository(self.session).registrar("venta", venta_id, "baja", venta.dict())
             self.session.commit()
+            etags.versiones.invalidar()
             return True
         return False
 
-    def get_by_auto_id(self, auto_id: int) -> List[Venta]:
-        statement = select(Venta).where(Venta.auto_id == auto_id)
+    def get_by_auto_id(self, auto_id: int, columnas: Optional[list] = None) -> List[Venta]:
+        statement = _seleccion(Venta, columnas).where(Venta.auto_id == auto_id)
         return self.session.exec(statement).all()
 
-    def get_by_comprador(self, nombre: str) -> List[Venta]:
-        statement = select(Venta).where(Venta.nombre_comprador.ilike(f"%{nombre}%"))
-        return self.session.exec(statement).all()
+    def get_by_comprador(self, nombre: str, skip: int = 0, limit: int = 100,
+                         columnas: Optional[list] = None) -> List[Venta]:
+        return busqueda.buscar_ventas_por_comprador(self.session, nombre, skip, limit, columnas)
 
     def get_ventas_por_fecha(self, fecha_inicio: datetime, fecha_fin: datetime) -> List[Venta]:
         statement = select(Venta).where(
@@ -114,65 +580,466 @@ class VentaRepository:
             Venta.fecha_venta <= fecha_fin
         )
         return self.session.exec(statement).all()
+
+    def get_with_auto(
+        self,
+        fecha_inicio: Optional[datetime.datetime] = None,
+        fecha_fin: Optional[datetime.datetime] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[Venta]:
+        """Ventas con su auto resueltas en una sola consulta con JOIN"""
+        statement = select(Venta).options(joinedload(Venta.auto))
+        if fecha_inicio:
+            statement = statement.where(Venta.fecha_venta >= fecha_inicio)
+        if fecha_fin:
+            statement = statement.where(Venta.fecha_venta <= fecha_fin)
+        statement = statement.order_by(Venta.fecha_venta, Venta.id).offset(skip).limit(limit)
+        return self.session.exec(statement).all()
     
-    # Agregar al final de repository.py
+class CambioRepository:
+    """Registro de cambios: solo agrega filas, en la transacción del llamador"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def registrar(self, tabla: str, registro_id: int, operacion: str, datos: dict):
+        self.registrar_lote([(tabla, registro_id, operacion, datos)])
+
+    def registrar_lote(self, cambios: List[Tuple[str, int, str, dict]]):
+        """Un solo INSERT para todos los cambios; se llama justo antes del commit
+
+        En PostgreSQL toma un advisory lock hasta el commit: dos transacciones
+        no intercalan sus ids, y quien lee "desde la secuencia N" no saltea
+        cambios que confirman tarde.
+        """
+        if not cambios:
+            return
+        if self.session.get_bind().dialect.name == "postgresql":
+            self.session.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": CAMBIOS_LOCK_ID})
+        fecha = hora_argentina()
+        self.session.execute(insert(Cambio), [
+            {
+                "tabla": tabla,
+                "registro_id": registro_id,
+                "operacion": operacion,
+                "datos": json.dumps(datos, default=str),
+                "fecha": fecha,
+            }
+            for tabla, registro_id, operacion, datos in cambios
+        ])
+
+    def historial(self, tabla: str, registro_id: int, desde: Optional[datetime.datetime] = None,
+                  hasta: Optional[datetime.datetime] = None, limit: int = 100) -> List[Cambio]:
+        """Cambios de un registro en orden, opcionalmente en un rango de fechas"""
+        statement = select(Cambio).where(Cambio.tabla == tabla, Cambio.registro_id == registro_id)
+        if desde:
+            statement = statement.where(Cambio.fecha >= desde)
+        if hasta:
+            statement = statement.where(Cambio.fecha <= hasta)
+        return self.session.exec(statement.order_by(Cambio.fecha, Cambio.id).limit(limit)).all()
+
+    def desde_secuencia(self, secuencia: int, limit: int = 500, tabla: Optional[str] = None) -> List[Cambio]:
+        """Cambios posteriores a `secuencia`, para sincronizar de forma incremental"""
+        statement = select(Cambio).where(Cambio.id > secuencia)
+        if tabla:
+            statement = statement.where(Cambio.tabla == tabla)
+        return self.session.exec(statement.order_by(Cambio.id).limit(limit)).all()
+
+class TrabajoRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def encolar(self, tipo: str, parametros: Optional[dict] = None, clave: Optional[str] = None,
+                max_intentos: int = 3) -> Trabajo:
+        """Agrega el trabajo a la transacción en curso; se confirma con ella"""
+        trabajo = Trabajo(
+            tipo=tipo,
+            parametros=json.dumps(parametros or {}, default=str),
+            clave=clave,
+            max_intentos=max_intentos,
+        )
+        self.session.add(trabajo)
+        return trabajo
+
+    def create(self, tipo: str, parametros: Optional[dict] = None, max_intentos: int = 3) -> Trabajo:
+        trabajo = self.encolar(tipo, parametros, max_intentos=max_intentos)
+        self.session.commit()
+        self.session.refresh(trabajo)
+        return trabajo
+
+    def get_by_id(self, trabajo_id: int) -> Optional[Trabajo]:
+        return self.session.get(Trabajo, trabajo_id)
+
+    def get_by_clave(self, clave: str) -> Optional[Trabajo]:
+        return self.session.exec(select(Trabajo).where(Trabajo.clave == clave)).first()
+
+    def reclamar(self, excluidos: List[str], lease_segundos: float):
+        """Toma el próximo trabajo listo con un UPDATE atómico
+
+        También recupera trabajos "en_curso" cuyo worker no terminó dentro del
+        lease (proceso caído). Devuelve (id, tipo, parametros, intentos,
+        max_intentos) o None.
+        """
+        ahora = hora_argentina()
+        candidato = select(Trabajo.id).where(or_(
+            (Trabajo.estado == "pendiente") & (Trabajo.disponible_desde <= ahora),
+            (Trabajo.estado == "en_curso") & (Trabajo.iniciado < ahora - datetime.timedelta(seconds=lease_segundos)),
+        ))
+        if excluidos:
+            candidato = candidato.where(Trabajo.tipo.not_in(excluidos))
+        candidato = candidato.order_by(Trabajo.id).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+        fila = self.session.execute(
+            update(Trabajo)
+            .where(Trabajo.id == candidato)
+            .values(estado="en_curso", iniciado=ahora, intentos=Trabajo.intentos + 1)
+            .returning(Trabajo.id, Trabajo.tipo, Trabajo.parametros, Trabajo.intentos, Trabajo.max_intentos)
+            .execution_options(synchronize_session=False)
+        ).first()
+        self.session.commit()
+        return fila
+
+    def completar(self, trabajo_id: int, resultado) -> None:
+        """Marca el trabajo terminado; confirma también lo que escribió la tarea"""
+        self.session.execute(
+            update(Trabajo)
+            .where(Trabajo.id == trabajo_id)
+            .values(
+                estado="completado",
+                resultado=json.dumps(resultado, default=str),
+                error=None,
+                terminado=hora_argentina(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.session.commit()
+
+    def fallar(self, trabajo_id: int, error: str, reintentar: bool, espera_segundos: float = 0) -> None:
+        """Vuelve a pendiente con espera si quedan intentos; si no, fallido"""
+        ahora = hora_argentina()
+        if reintentar:
+            valores = {
+                "estado": "pendiente",
+                "disponible_desde": ahora + datetime.timedelta(seconds=espera_segundos),
+            }
+        else:
+            valores = {"estado": "fallido", "terminado": ahora}
+        self.session.execute(
+            update(Trabajo)
+            .where(Trabajo.id == trabajo_id)
+            .values(error=error[:2000], **valores)
+            .execution_options(synchronize_session=False)
+        )
+        self.session.commit()
+
+class ResumenRepository:
+    """Mantiene las tablas de resumen dentro de la transacción del llamador"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def _incrementar(self, modelo, claves: dict, incrementos: dict, minimos: dict = None, maximos: dict = None):
+        dialecto = self.session.get_bind().dialect.name
+        if dialecto == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+            menor, mayor = func.least, func.greatest
+        elif dialecto == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+            menor, mayor = func.min, func.max
+        else:
+            raise RuntimeError(f"Dialecto no soportado para el resumen: {dialecto}")
+        minimos = minimos or {}
+        maximos = maximos or {}
+        statement = insert(modelo).values(**claves, **incrementos, **minimos, **maximos)
+        cambios = {campo: getattr(modelo, campo) + statement.excluded[campo] for campo in incrementos}
+        for campo in minimos:
+            cambios[campo] = func.coalesce(menor(getattr(modelo, campo), statement.excluded[campo]), statement.excluded[campo])
+        for campo in maximos:
+            cambios[campo] = func.coalesce(mayor(getattr(modelo, campo), statement.excluded[campo]), statement.excluded[campo])
+        statement = statement.on_conflict_do_update(index_elements=list(claves), set_=cambios)
+        self.session.execute(statement)
+
+    def ajustar_inventario(self, marca: str, estado: str, cantidad: int, valor: float):
+        if not ESTADISTICAS_RESUMEN:
+            return
+        self._incrementar(
+            ResumenInventario,
+            {"marca": marca, "estado": estado},
+            {"cantidad": cantidad, "valor": valor},
+        )
+
+    def ajustar_antiguedad(self, fecha_ingreso, marca: str, modelo: str, anio: int, estado: str,
+                           cantidad: int, valor: float):
+        """Stock por día de ingreso; los autos vendidos no cuentan"""
+        if not ESTADISTICAS_RESUMEN or estado == "vendido":
+            return
+        self._incrementar(
+            RollupInventarioIngreso,
+            {"dia_ingreso": _como_fecha(fecha_ingreso), "marca": marca, "modelo": modelo, "anio": anio, "estado": estado},
+            {"cantidad": cantidad, "valor": valor},
+        )
+
+    def ajustar_autos(self, filas, signo: int = 1):
+        """Aplica a los resúmenes de inventario filas (marca, modelo, anio, estado,
+        fecha_ingreso, cantidad, valor), agrupadas antes de escribir"""
+        if not ESTADISTICAS_RESUMEN:
+            return
+        por_marca = {}
+        por_ingreso = {}
+        for marca, modelo, anio, estado, fecha_ingreso, cantidad, valor in filas:
+            for acumulado, clave in (
+                (por_marca, (marca, estado)),
+                (por_ingreso, (_como_fecha(fecha_ingreso), marca, modelo, anio, estado)),
+            ):
+                total_cantidad, total_valor = acumulado.get(clave, (0, 0.0))
+                acumulado[clave] = (total_cantidad + cantidad, total_valor + valor)
+        for (marca, estado), (cantidad, valor) in por_marca.items():
+            self.ajustar_inventario(marca, estado, signo * cantidad, signo * valor)
+        for (dia, marca, modelo, anio, estado), (cantidad, valor) in por_ingreso.items():
+            self.ajustar_antiguedad(dia, marca, modelo, anio, estado, signo * cantidad, signo * valor)
+
+    def ajustar_ventas(self, cantidad: int, monto: float):
+        if not ESTADISTICAS_RESUMEN or (cantidad == 0 and monto == 0):
+            return
+        self._incrementar(
+            ResumenVentas,
+            {"id": 1},
+            {"total_ventas": cantidad, "ingresos_totales": monto},
+        )
+
+    def registrar_venta_rollup(self, fecha: datetime.datetime, marca: str, modelo: str, precio: float):
+        if not ESTADISTICAS_RESUMEN:
+            return
+        self._incrementar(
+            RollupVentasDia,
+            {"dia": fecha.date(), "marca": marca, "modelo": modelo},
+            {"cantidad": 1, "total": precio},
+            minimos={"minimo": precio},
+            maximos={"maximo": precio},
+        )
+
+    def ajustar_venta_rollup(self, fecha: datetime.datetime, marca: str, modelo: str,
+                             cantidad: int, precio_anterior: float, precio_nuevo: Optional[float]):
+        """Aplica la baja o el cambio de precio de una venta a su fila diaria"""
+        if not ESTADISTICAS_RESUMEN:
+            return
+        dia = fecha.date()
+        delta = (precio_nuevo or 0) - precio_anterior
+        self._incrementar(
+            RollupVentasDia,
+            {"dia": dia, "marca": marca, "modelo": modelo},
+            {"cantidad": cantidad, "total": delta},
+        )
+        fila = self.session.get(RollupVentasDia, (dia, marca, modelo))
+        self.session.refresh(fila)
+        if precio_nuevo is not None and (fila.minimo is None or precio_nuevo < fila.minimo or precio_nuevo > fila.maximo):
+            fila.minimo = precio_nuevo if fila.minimo is None else min(fila.minimo, precio_nuevo)
+            fila.maximo = precio_nuevo if fila.maximo is None else max(fila.maximo, precio_nuevo)
+        if precio_anterior in (fila.minimo, fila.maximo):
+            # El extremo salió del bucket: se recalcula solo ese día/modelo
+            inicio = datetime.datetime.combine(dia, datetime.time.min)
+            fila.minimo, fila.maximo = self.session.execute(
+                select(func.min(Venta.precio), func.max(Venta.precio))
+                .join(Auto, Auto.id == Venta.auto_id)
+                .where(
+                    Venta.fecha_venta >= inicio,
+                    Venta.fecha_venta < inicio + datetime.timedelta(days=1),
+                    Auto.marca == marca,
+                    Auto.modelo == modelo,
+                )
+            ).one()
+        self.session.add(fila)
+
+    def ajustar_rotacion(self, fecha_venta: datetime.datetime, fecha_ingreso: datetime.datetime,
+                         marca: str, modelo: str, anio: int, cantidad: int):
+        """Suma (o resta) los días que tardó en venderse un auto a su día de venta"""
+        if not ESTADISTICAS_RESUMEN:
+            return
+        dias = (fecha_venta - fecha_ingreso).total_seconds() / 86400
+        self._incrementar(
+            RollupRotacionDia,
+            {"dia": fecha_venta.date(), "marca": marca, "modelo": modelo, "anio": anio},
+            {"cantidad": cantidad, "dias_total": cantidad * dias},
+        )
+
+    def registrar_cambio(self, *tablas: str):
+        """Incrementa la versión de las tablas escritas (ETags de los listados)
+
+        A diferencia de los resúmenes no depende de ESTADISTICAS_RESUMEN.
+        """
+        for tabla in tablas:
+            self._incrementar(VersionTabla, {"tabla": tabla}, {"version": 1})
+
+    def agregar_auto(self, auto: Auto):
+        self.ajustar_autos([
+            (auto.marca, auto.modelo, auto.anio, auto.estado or "disponible", auto.fecha_ingreso, 1, auto.precio)
+        ])
+
+    def quitar_auto(self, auto: Auto):
+        self.ajustar_autos([(auto.marca, auto.modelo, auto.anio, auto.estado, auto.fecha_ingreso, 1, auto.precio)], signo=-1)
+
+    def reconstruir(self):
+        """Recalcular las tablas de resumen desde autos y ventas
+
+        En PostgreSQL las tablas de resumen quedan bloqueadas para escritura
+        hasta el commit: una venta concurrente espera y aplica su ajuste sobre
+        el resumen ya reconstruido en lugar de perderse o duplicarse.
+        """
+        if self.session.get_bind().dialect.name == "postgresql":
+            tablas = (ResumenInventario, ResumenVentas, RollupVentasDia, RollupInventarioIngreso, RollupRotacionDia)
+            self.session.execute(text(
+                f"LOCK TABLE {', '.join(tabla.__tablename__ for tabla in tablas)} IN EXCLUSIVE MODE"
+            ))
+        self.session.execute(delete(ResumenInventario))
+        self.session.execute(delete(ResumenVentas))
+        por_marca_estado = select(
+            Auto.marca, Auto.estado, func.count(Auto.id), func.coalesce(func.sum(Auto.precio), 0)
+        ).group_by(Auto.marca, Auto.estado)
+        for marca, estado, cantidad, valor in self.session.execute(por_marca_estado):
+            self.session.add(ResumenInventario(marca=marca, estado=estado, cantidad=cantidad, valor=valor))
+        total_ventas, ingresos = self.session.execute(
+            select(func.count(Venta.id), func.coalesce(func.sum(Venta.precio), 0))
+        ).one()
+        self.session.add(ResumenVentas(id=1, total_ventas=total_ventas, ingresos_totales=ingresos))
+        self.session.execute(delete(RollupVentasDia))
+        dia = func.date(Venta.fecha_venta)
+        por_dia = (
+            select(dia, Auto.marca, Auto.modelo, func.count(Venta.id), func.sum(Venta.precio),
+                   func.min(Venta.precio), func.max(Venta.precio))
+            .join(Auto, Auto.id == Venta.auto_id)
+            .group_by(dia, Auto.marca, Auto.modelo)
+        )
+        for fecha, marca, modelo, cantidad, total, minimo, maximo in self.session.execute(por_dia):
+            if isinstance(fecha, str):
+                fecha = datetime.date.fromisoformat(fecha)
+            self.session.add(RollupVentasDia(
+                dia=fecha, marca=marca, modelo=modelo, cantidad=cantidad,
+                total=total, minimo=minimo, maximo=maximo,
+            ))
+        self.session.execute(delete(RollupInventarioIngreso))
+        claves = [func.date(Auto.fecha_ingreso), Auto.marca, Auto.modelo, Auto.anio, Auto.estado]
+        stock = (
+            select(*claves, func.count(Auto.id), func.sum(Auto.precio))
+            .where(Auto.estado != "vendido")
+            .group_by(*claves)
+        )
+        for fecha, marca, modelo, anio, estado, cantidad, valor in self.session.execute(stock):
+            self.session.add(RollupInventarioIngreso(
+                dia_ingreso=_como_fecha(fecha), marca=marca, modelo=modelo, anio=anio,
+                estado=estado, cantidad=cantidad, valor=valor,
+            ))
+        self.session.execute(delete(RollupRotacionDia))
+        dialecto = self.session.get_bind().dialect.name
+        claves = [dia, Auto.marca, Auto.modelo, Auto.anio]
+        rotacion = (
+            select(*claves, func.count(Venta.id), func.sum(_dias_entre(dialecto, Auto.fecha_ingreso, Venta.fecha_venta)))
+            .join(Auto, Auto.id == Venta.auto_id)
+            .group_by(*claves)
+        )
+        for fecha, marca, modelo, anio, cantidad, dias_total in self.session.execute(rotacion):
+            self.session.add(RollupRotacionDia(
+                dia=_como_fecha(fecha), marca=marca, modelo=modelo, anio=anio,
+                cantidad=cantidad, dias_total=dias_total,
+            ))
+        self.session.commit()
 
 class EstadisticasRepository:
     def __init__(self, session: Session):
         self.session = session
-        self.auto_repo = AutoRepository(session)
-        self.venta_repo = VentaRepository(session)
 
-    def obtener_estadisticas_generales(self) -> dict:
-        """Obtener estadísticas completas de la concesionaria"""
-        
-        # Obtener datos
-        autos = self.auto_repo.get_all(limit=10000)  # Número alto para obtener todos
-        ventas = self.venta_repo.get_all(limit=10000)
-        
-        # Cálculos básicos
-        total_autos = len(autos)
-        autos_disponibles = len([auto for auto in autos if auto.estado == "disponible"])
-        autos_vendidos = len([auto for auto in autos if auto.estado == "vendido"])
-        
-        # Valor del inventario
-        valor_inventario = sum(auto.precio for auto in autos if auto.estado == "disponible")
-        
-        # Ingresos totales
-        ingresos_totales = sum(venta.precio for venta in ventas)
-        
-        # Marca más popular
-        from collections import Counter
-        if autos:
-            marcas = [auto.marca for auto in autos]
-            marca_counter = Counter(marcas)
-            marca_mas_popular = marca_counter.most_common(1)[0][0]
+    def _inventario_por_marca_estado(self) -> list:
+        """Filas (marca, estado, cantidad, valor) desde el resumen o agrupando autos"""
+        if ESTADISTICAS_RESUMEN:
+            statement = select(
+                ResumenInventario.marca, ResumenInventario.estado,
+                ResumenInventario.cantidad, ResumenInventario.valor,
+            ).where(ResumenInventario.cantidad > 0)
+        else:
+            statement = select(
+                Auto.marca, Auto.estado, func.count(Auto.id), func.coalesce(func.sum(Auto.precio), 0)
+            ).group_by(Auto.marca, Auto.estado)
+        return self.session.execute(statement).all()
+
+    def _totales_ventas(self) -> tuple:
+        if ESTADISTICAS_RESUMEN:
+            resumen = self.session.get(ResumenVentas, 1)
+            if resumen:
+                return resumen.total_ventas, resumen.ingresos_totales
+            return 0, 0.0
+        return self.session.execute(
+            select(func.count(Venta.id), func.coalesce(func.sum(Venta.precio), 0))
+        ).one()
+
+    def obtener_resumen(self) -> dict:
+        """Totales del dashboard sin recorrer autos ni ventas"""
+        autos_por_marca = {}
+        autos_por_estado = {}
+        valor_inventario = 0.0
+        for marca, estado, cantidad, valor in self._inventario_por_marca_estado():
+            autos_por_marca[marca] = autos_por_marca.get(marca, 0) + cantidad
+            autos_por_estado[estado] = autos_por_estado.get(estado, 0) + cantidad
+            if estado == "disponible":
+                valor_inventario += valor
+
+        total_ventas, ingresos_totales = self._totales_ventas()
+
+        if autos_por_marca:
+            marca_mas_popular = max(autos_por_marca, key=autos_por_marca.get)
         else:
             marca_mas_popular = "N/A"
-            
-        # Estadísticas adicionales que podrían ser útiles
-        autos_por_marca = Counter([auto.marca for auto in autos])
-        autos_por_estado = Counter([auto.estado for auto in autos])
-        ventas_por_comprador = Counter([venta.nombre_comprador for venta in ventas])
-        
+
         return {
-            "total_autos": total_autos,
-            "autos_disponibles": autos_disponibles,
-            "autos_vendidos": autos_vendidos,
+            "total_autos": sum(autos_por_estado.values()),
+            "autos_disponibles": autos_por_estado.get("disponible", 0),
+            "autos_vendidos": autos_por_estado.get("vendido", 0),
             "valor_inventario": valor_inventario,
             "ingresos_totales": ingresos_totales,
             "marca_mas_popular": marca_mas_popular,
-            "detalles_autos_por_marca": dict(autos_por_marca),
-            "detalles_autos_por_estado": dict(autos_por_estado),
-            "total_ventas": len(ventas),
-            "comprador_frecuente": ventas_por_comprador.most_common(1)[0][0] if ventas_por_comprador else "N/A"
+            "detalles_autos_por_marca": autos_por_marca,
+            "detalles_autos_por_estado": autos_por_estado,
+            "total_ventas": total_ventas,
         }
+
+    def obtener_estadisticas_generales(self) -> dict:
+        """Obtener estadísticas completas de la concesionaria"""
+        estadisticas = self.obtener_resumen()
+        estadisticas["comprador_frecuente"] = self.obtener_comprador_frecuente()
+        return estadisticas
+
+    def obtener_comprador_frecuente(self) -> str:
+        """Comprador con más ventas registradas"""
+        statement = (
+            select(Venta.nombre_comprador)
+            .group_by(Venta.nombre_comprador)
+            .order_by(func.count(Venta.id).desc())
+            .limit(1)
+        )
+        comprador = self.session.execute(statement).scalar()
+        return comprador or "N/A"
     
     def obtener_estadisticas_ventas(self) -> dict:
         """Estadísticas específicas de ventas"""
-        ventas = self.venta_repo.get_all(limit=10000)
+        if ESTADISTICAS_RESUMEN:
+            statement = select(
+                func.sum(RollupVentasDia.cantidad),
+                func.sum(RollupVentasDia.total),
+                func.max(RollupVentasDia.maximo),
+                func.min(RollupVentasDia.minimo),
+                func.min(RollupVentasDia.dia),
+                func.max(RollupVentasDia.dia),
+            ).where(RollupVentasDia.cantidad > 0)
+        else:
+            statement = select(
+                func.count(Venta.id),
+                func.sum(Venta.precio),
+                func.max(Venta.precio),
+                func.min(Venta.precio),
+                func.min(Venta.fecha_venta),
+                func.max(Venta.fecha_venta),
+            )
+        total_ventas, total, maximo, minimo, primera, ultima = self.session.execute(statement).one()
         
-        if not ventas:
+        if not total_ventas:
             return {
                 "total_ventas": 0,
                 "promedio_venta": 0,
@@ -181,14 +1048,228 @@ class EstadisticasRepository:
                 "ingreso_mensual": 0
             }
         
-        precios = [venta.precio for venta in ventas]
-        
+        # Ingreso promedio por mes calendario entre la primera y la última venta
+        primera, ultima = _como_fecha(primera), _como_fecha(ultima)
+        meses = (ultima.year - primera.year) * 12 + ultima.month - primera.month + 1
         return {
-            "total_ventas": len(ventas),
-            "promedio_venta": sum(precios) / len(precios),
-            "venta_mas_alta": max(precios),
-            "venta_mas_baja": min(precios),
-            "ingreso_mensual": sum(precios) / 12  # Promedio mensual aproximado
+            "total_ventas": total_ventas,
+            "promedio_venta": total / total_ventas,
+            "venta_mas_alta": maximo,
+            "venta_mas_baja": minimo,
+            "ingreso_mensual": total / meses
         }
-    
 
+    def obtener_analitica_ventas(
+        self,
+        periodo: str = "mes",
+        desde: Optional[datetime.date] = None,
+        hasta: Optional[datetime.date] = None,
+        por_marca: bool = False,
+        por_modelo: bool = False,
+        marca: Optional[str] = None,
+    ) -> List[dict]:
+        """Ingresos, cantidad, promedio y extremos por período, marca y modelo"""
+        dialecto = self.session.get_bind().dialect.name
+        if ESTADISTICAS_RESUMEN:
+            dia, col_marca, col_modelo = RollupVentasDia.dia, RollupVentasDia.marca, RollupVentasDia.modelo
+            metricas = [
+                func.sum(RollupVentasDia.cantidad), func.sum(RollupVentasDia.total),
+                func.min(RollupVentasDia.minimo), func.max(RollupVentasDia.maximo),
+            ]
+            statement_base = select().select_from(RollupVentasDia).where(RollupVentasDia.cantidad > 0)
+        else:
+            dia, col_marca, col_modelo = func.date(Venta.fecha_venta), Auto.marca, Auto.modelo
+            metricas = [
+                func.count(Venta.id), func.sum(Venta.precio),
+                func.min(Venta.precio), func.max(Venta.precio),
+            ]
+            statement_base = select().select_from(Venta).join(Auto, Auto.id == Venta.auto_id)
+
+        grupos = []
+        if periodo != "total":
+            grupos.append(("periodo", _expresion_periodo(dialecto, periodo, dia)))
+        if por_marca or por_modelo:
+            grupos.append(("marca", col_marca))
+        if por_modelo:
+            grupos.append(("modelo", col_modelo))
+
+        statement = statement_base.add_columns(*[expresion for _, expresion in grupos], *metricas)
+        if desde:
+            statement = statement.where(dia >= desde)
+        if hasta:
+            statement = statement.where(dia <= hasta)
+        if marca:
+            statement = statement.where(col_marca == marca)
+        if grupos:
+            expresiones = [expresion for _, expresion in grupos]
+            statement = statement.group_by(*expresiones).order_by(*expresiones)
+
+        filas = []
+        for fila in self.session.execute(statement):
+            valores = dict(zip([nombre for nombre, _ in grupos], fila[:len(grupos)]))
+            cantidad, total, minimo, maximo = fila[len(grupos):]
+            if not cantidad:
+                continue
+            if "periodo" in valores:
+                valores["periodo"] = str(valores["periodo"])[:10]
+            filas.append({
+                **valores,
+                "cantidad": cantidad,
+                "total": total,
+                "promedio": total / cantidad,
+                "minimo": minimo,
+                "maximo": maximo,
+            })
+        return filas
+
+    def obtener_antiguedad_inventario(
+        self,
+        por_marca: bool = False,
+        por_modelo: bool = False,
+        por_anio: bool = False,
+        marca: Optional[str] = None,
+        estados: Optional[List[str]] = None,
+    ) -> List[dict]:
+        """Cantidad, valor y días promedio del stock por banda de antigüedad
+
+        El stock son los autos no vendidos; la antigüedad se cuenta en días
+        desde `fecha_ingreso` hasta hoy.
+        """
+        dialecto = self.session.get_bind().dialect.name
+        hoy = hora_argentina().date()
+        if ESTADISTICAS_RESUMEN:
+            rollup = RollupInventarioIngreso
+            dia, col_marca, col_modelo, col_anio, col_estado = (
+                rollup.dia_ingreso, rollup.marca, rollup.modelo, rollup.anio, rollup.estado
+            )
+            edad = _dias_entre(dialecto, dia, literal(hoy))
+            metricas = [func.sum(rollup.cantidad), func.sum(rollup.valor), func.sum(rollup.cantidad * edad)]
+            statement_base = select().select_from(rollup).where(rollup.cantidad > 0)
+        else:
+            dia, col_marca, col_modelo, col_anio, col_estado = (
+                func.date(Auto.fecha_ingreso), Auto.marca, Auto.modelo, Auto.anio, Auto.estado
+            )
+            edad = _dias_entre(dialecto, dia, literal(hoy))
+            metricas = [func.count(Auto.id), func.sum(Auto.precio), func.sum(edad)]
+            statement_base = select().select_from(Auto).where(Auto.estado != "vendido")
+
+        banda = case(
+            *[(dia >= hoy - datetime.timedelta(days=limite), i) for i, limite in enumerate(ANTIGUEDAD_BANDAS_DIAS)],
+            else_=len(ANTIGUEDAD_BANDAS_DIAS),
+        )
+        grupos = []
+        if por_marca or por_modelo:
+            grupos.append(("marca", col_marca))
+        if por_modelo:
+            grupos.append(("modelo", col_modelo))
+        if por_anio:
+            grupos.append(("anio", col_anio))
+        expresiones = [expresion for _, expresion in grupos] + [banda]
+
+        statement = statement_base.add_columns(*expresiones, *metricas)
+        if marca:
+            statement = statement.where(col_marca == marca)
+        if estados:
+            statement = statement.where(col_estado.in_(estados))
+        statement = statement.group_by(*expresiones).order_by(*expresiones)
+
+        filas = []
+        for fila in self.session.execute(statement):
+            valores = dict(zip([nombre for nombre, _ in grupos], fila[:len(grupos)]))
+            indice, cantidad, valor, edad_total = fila[len(grupos):]
+            if not cantidad:
+                continue
+            filas.append({
+                **valores,
+                "banda": _BANDAS_ANTIGUEDAD[indice],
+                "cantidad": cantidad,
+                "valor": valor,
+                "dias_promedio": edad_total / cantidad,
+            })
+        return filas
+
+    def obtener_rotacion_ventas(
+        self,
+        periodo: str = "total",
+        desde: Optional[datetime.date] = None,
+        hasta: Optional[datetime.date] = None,
+        por_marca: bool = False,
+        por_modelo: bool = False,
+        por_anio: bool = False,
+        marca: Optional[str] = None,
+    ) -> List[dict]:
+        """Días promedio entre el ingreso y la venta, por período de venta, marca, modelo y año"""
+        dialecto = self.session.get_bind().dialect.name
+        if ESTADISTICAS_RESUMEN:
+            rollup = RollupRotacionDia
+            dia, col_marca, col_modelo, col_anio = rollup.dia, rollup.marca, rollup.modelo, rollup.anio
+            metricas = [func.sum(rollup.cantidad), func.sum(rollup.dias_total)]
+            statement_base = select().select_from(rollup).where(rollup.cantidad > 0)
+        else:
+            dia, col_marca, col_modelo, col_anio = func.date(Venta.fecha_venta), Auto.marca, Auto.modelo, Auto.anio
+            metricas = [func.count(Venta.id), func.sum(_dias_entre(dialecto, Auto.fecha_ingreso, Venta.fecha_venta))]
+            statement_base = select().select_from(Venta).join(Auto, Auto.id == Venta.auto_id)
+
+        grupos = []
+        if periodo != "total":
+            grupos.append(("periodo", _expresion_periodo(dialecto, periodo, dia)))
+        if por_marca or por_modelo:
+            grupos.append(("marca", col_marca))
+        if por_modelo:
+            grupos.append(("modelo", col_modelo))
+        if por_anio:
+            grupos.append(("anio", col_anio))
+
+        statement = statement_base.add_columns(*[expresion for _, expresion in grupos], *metricas)
+        if desde:
+            statement = statement.where(dia >= desde)
+        if hasta:
+            statement = statement.where(dia <= hasta)
+        if marca:
+            statement = statement.where(col_marca == marca)
+        if grupos:
+            expresiones = [expresion for _, expresion in grupos]
+            statement = statement.group_by(*expresiones).order_by(*expresiones)
+
+        filas = []
+        for fila in self.session.execute(statement):
+            valores = dict(zip([nombre for nombre, _ in grupos], fila[:len(grupos)]))
+            cantidad, dias_total = fila[len(grupos):]
+            if not cantidad:
+                continue
+            if "periodo" in valores:
+                valores["periodo"] = str(valores["periodo"])[:10]
+            filas.append({**valores, "cantidad": cantidad, "dias_promedio": dias_total / cantidad})
+        return filas
+
+def _diferencias(instancia, cambios: dict) -> dict:
+    """{campo: [anterior, nuevo]} de los campos que cambian de valor"""
+    return {
+        campo: [getattr(instancia, campo), valor]
+        for campo, valor in cambios.items()
+        if getattr(instancia, campo) != valor
+    }
+
+def _como_fecha(valor) -> datetime.date:
+    if isinstance(valor, str):
+        return datetime.date.fromisoformat(valor[:10])
+    if isinstance(valor, datetime.datetime):
+        return valor.date()
+    return valor
+
+def _expresion_periodo(dialecto: str, periodo: str, dia):
+    """Inicio del día/semana/mes que contiene `dia`"""
+    if periodo == "dia":
+        return dia
+    if dialecto == "postgresql":
+        unidad = {"semana": "'week'", "mes": "'month'"}[periodo]
+        return func.date(func.date_trunc(literal_column(unidad), dia))
+    if periodo == "semana":
+        return func.date(dia, literal_column("'-6 days'"), literal_column("'weekday 1'"))
+    return func.strftime(literal_column("'%Y-%m-01'"), dia)
+
+def _dias_entre(dialecto: str, desde, hasta):
+    """Días (con fracción) de `desde` a `hasta`"""
+    if dialecto == "postgresql":
+        return extract("epoch", cast(hasta, DateTime) - cast(desde, DateTime)) / 86400
+    return func.julianday(hasta) - func.julianday(desde)
@@ -0,0 +1,168 @@
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import Dict, List, Optional, Tuple
+from models import Auto, AutoCreate, AutoUpdate, Venta, VentaCreate, VentaUpdate, FiltrosAuto, CriterioAutos, Trabajo, Cambio
+from repository import AutoRepository, VentaRepository, TrabajoRepository, CambioRepository
+from cache import EntradaCache
+import datetime
+
+# Los repositorios async reutilizan la lógica de los síncronos con run_sync:
+# el código corre sobre la conexión async (asyncpg/aiosqlite) sin pasar por
+# el threadpool, y las reglas de negocio quedan en un solo lugar.
+
+class AsyncAutoRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _run(self, metodo: str, *args):
+        return await self.session.run_sync(
+            lambda session: getattr(AutoRepository(session), metodo)(*args)
+        )
+
+    async def create(self, auto: AutoCreate) -> Auto:
+        return await self._run("create", auto)
+
+    async def bulk_create(self, filas: List[Tuple[int, AutoCreate]]) -> Tuple[int, List[dict]]:
+        return await self._run("bulk_create", filas)
+
+    async def get_by_id(self, auto_id: int) -> Optional[Auto]:
+        return await self.session.get(Auto, auto_id)
+
+    async def get_by_id_with_ventas(self, auto_id: int) -> Optional[Auto]:
+        return await self.session.get(Auto, auto_id, options=[selectinload(Auto.ventas)])
+
+    async def get_all(self, skip: int = 0, limit: int = 100, columnas: Optional[list] = None) -> List[Auto]:
+        return await self._run("get_all", skip, limit, columnas)
+
+    async def get_all_with_ventas(self, skip: int = 0, limit: int = 100) -> List[Auto]:
+        return await self._run("get_all_with_ventas", skip, limit)
+
+    async def get_page(self, cursor: Optional[str] = None, limit: int = 100, orden: str = "id") -> Tuple[List[Auto], Optional[str]]:
+        return await self._run("get_page", cursor, limit, orden)
+
+    async def filtrar(self, filtros: FiltrosAuto, cursor: Optional[str] = None, limit: int = 100,
+                      orden: str = "id", descendente: bool = False,
+                      columnas: Optional[list] = None) -> Tuple[List[Auto], Optional[str]]:
+        return await self._run("filtrar", filtros, cursor, limit, orden, descendente, columnas)
+
+    async def facetas(self, filtros: FiltrosAuto) -> Tuple[int, Dict[str, Dict[str, int]]]:
+        return await self._run("facetas", filtros)
+
+    async def update(self, auto_id: int, auto_update: AutoUpdate) -> Optional[Auto]:
+        return await self._run("update", auto_id, auto_update)
+
+    async def update_many(self, criterio: CriterioAutos, auto_update: AutoUpdate,
+                          porcentaje_precio: Optional[float] = None) -> int:
+        return await self._run("update_many", criterio, auto_update, porcentaje_precio)
+
+    async def delete(self, auto_id: int) -> bool:
+        return await self._run("delete", auto_id)
+
+    async def get_by_chasis(self, numero_chasis: str) -> Optional[Auto]:
+        return await self._run("get_by_chasis", numero_chasis)
+
+    async def get_by_id_cached(self, auto_id: int) -> Optional[EntradaCache]:
+        return await self._run("get_by_id_cached", auto_id)
+
+    async def get_by_chasis_cached(self, numero_chasis: str) -> Optional[EntradaCache]:
+        return await self._run("get_by_chasis_cached", numero_chasis)
+
+    async def get_many_by_ids(self, ids: List[int]) -> List[Optional[Auto]]:
+        return await self._run("get_many_by_ids", ids)
+
+    async def get_many_by_chasis(self, numeros_chasis: List[str]) -> List[Optional[Auto]]:
+        return await self._run("get_many_by_chasis", numeros_chasis)
+
+    async def search_by_marca_modelo(self, marca: str = None, modelo: str = None, skip: int = 0, limit: int = 100,
+                                     columnas: Optional[list] = None) -> List[Auto]:
+        return await self._run("search_by_marca_modelo", marca, modelo, skip, limit, columnas)
+
+    async def buscar(self, texto: str, skip: int = 0, limit: int = 100) -> List[Auto]:
+        return await self._run("buscar", texto, skip, limit)
+
+class AsyncVentaRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _run(self, metodo: str, *args):
+        return await self.session.run_sync(
+            lambda session: getattr(VentaRepository(session), metodo)(*args)
+        )
+
+    async def create(self, venta: VentaCreate, idempotency_key: Optional[str] = None) -> Venta:
+        return await self._run("create", venta, idempotency_key)
+
+    async def get_by_id(self, venta_id: int) -> Optional[Venta]:
+        return await self.session.get(Venta, venta_id)
+
+    async def get_by_id_with_auto(self, venta_id: int) -> Optional[Venta]:
+        return await self.session.get(Venta, venta_id, options=[joinedload(Venta.auto)])
+
+    async def get_all(self, skip: int = 0, limit: int = 100, columnas: Optional[list] = None) -> List[Venta]:
+        return await self._run("get_all", skip, limit, columnas)
+
+    async def get_page(self, cursor: Optional[str] = None, limit: int = 100, orden: str = "id",
+                       columnas: Optional[list] = None) -> Tuple[List[Venta], Optional[str]]:
+        return await self._run("get_page", cursor, limit, orden, columnas)
+
+    async def get_many_by_ids(self, ids: List[int]) -> List[Optional[Venta]]:
+        return await self._run("get_many_by_ids", ids)
+
+    async def update(self, venta_id: int, venta_update: VentaUpdate) -> Optional[Venta]:
+        return await self._run("update", venta_id, venta_update)
+
+    async def delete(self, venta_id: int) -> bool:
+        return await self._run("delete", venta_id)
+
+    async def get_by_auto_id(self, auto_id: int, columnas: Optional[list] = None) -> List[Venta]:
+        return await self._run("get_by_auto_id", auto_id, columnas)
+
+    async def get_by_comprador(self, nombre: str, skip: int = 0, limit: int = 100,
+                               columnas: Optional[list] = None) -> List[Venta]:
+        return await self._run("get_by_comprador", nombre, skip, limit, columnas)
+
+    async def get_ventas_por_fecha(self, fecha_inicio: datetime.datetime, fecha_fin: datetime.datetime) -> List[Venta]:
+        return await self._run("get_ventas_por_fecha", fecha_inicio, fecha_fin)
+
+    async def get_with_auto(
+        self,
+        fecha_inicio: Optional[datetime.datetime] = None,
+        fecha_fin: Optional[datetime.datetime] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[Venta]:
+        return await self._run("get_with_auto", fecha_inicio, fecha_fin, skip, limit)
+
+class AsyncTrabajoRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _run(self, metodo: str, *args):
+        return await self.session.run_sync(
+            lambda session: getattr(TrabajoRepository(session), metodo)(*args)
+        )
+
+    async def create(self, tipo: str, parametros: Optional[dict] = None, max_intentos: int = 3) -> Trabajo:
+        return await self._run("create", tipo, parametros, max_intentos)
+
+    async def get_by_id(self, trabajo_id: int) -> Optional[Trabajo]:
+        return await self.session.get(Trabajo, trabajo_id)
+
+    async def get_by_clave(self, clave: str) -> Optional[Trabajo]:
+        return await self._run("get_by_clave", clave)
+
+class AsyncCambioRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _run(self, metodo: str, *args):
+        return await self.session.run_sync(
+            lambda session: getattr(CambioRepository(session), metodo)(*args)
+        )
+
+    async def historial(self, tabla: str, registro_id: int, desde: Optional[datetime.datetime] = None,
+                        hasta: Optional[datetime.datetime] = None, limit: int = 100) -> List[Cambio]:
+        return await self._run("historial", tabla, registro_id, desde, hasta, limit)
+
+    async def desde_secuencia(self, secuencia: int, limit: int = 500, tabla: Optional[str] = None) -> List[Cambio]:
+        return await self._run("desde_secuencia", secuencia, limit, tabla)
@@ -0,0 +1,27 @@
+from fastapi.responses import ORJSONResponse
+from typing import Optional
+from models import Auto, Venta, AutoResponse, VentaResponse
+import os
+
+# Camino liviano de los listados: se seleccionan solo las columnas de la
+# respuesta como tuplas (sin instancias ORM ni identity map), no se vuelven a
+# validar con el response_model y se codifican con orjson.
+
+# Rutas que lo usan, separadas por coma ("" lo desactiva en todas)
+SERIALIZACION_RAPIDA = {
+    ruta.strip() for ruta in os.getenv(
+        "SERIALIZACION_RAPIDA", "listar_autos,listar_ventas,ventas_por_auto,ventas_por_comprador"
+    ).split(",") if ruta.strip()
+}
+
+CAMPOS_AUTO = list(AutoResponse.__fields__)
+CAMPOS_VENTA = list(VentaResponse.__fields__)
+COLUMNAS_AUTO = [getattr(Auto, campo) for campo in CAMPOS_AUTO]
+COLUMNAS_VENTA = [getattr(Venta, campo) for campo in CAMPOS_VENTA]
+
+def activa(ruta: str) -> bool:
+    return ruta in SERIALIZACION_RAPIDA
+
+def respuesta(campos: list, filas, headers: Optional[dict] = None) -> ORJSONResponse:
+    """Lista JSON armada directamente desde las tuplas de columnas"""
+    return ORJSONResponse([dict(zip(campos, fila)) for fila in filas], headers=headers)
@@ -0,0 +1,61 @@
+"""Punto de entrada de producción
+
+Prepara el esquema una sola vez (tablas, índices de búsqueda y resumen) y
+luego levanta uvicorn con varios procesos worker, que arrancan sin volver a
+tocar el esquema.
+
+Uso:
+    python servidor.py                  # WEB_CONCURRENCY workers (uno por núcleo)
+    python servidor.py --workers 4 --port 8000
+    python servidor.py --solo-preparar  # paso de migración aparte, sin servir
+    python servidor.py --sin-preparar   # el esquema ya lo preparó otro paso
+"""
+import argparse
+import os
+import sys
+import uvicorn
+
+def parsear_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument("--solo-preparar", action="store_true", help="preparar el esquema y salir")
+    grupo.add_argument("--sin-preparar", action="store_true", help="no preparar el esquema")
+    return parser.parse_args(argv)
+
+def preparar():
+    import database
+    from main import preparar_base
+    preparar_base()
+    # Los workers abren sus propias conexiones
+    database.engine.dispose()
+
+def main(argv=None):
+    args = parsear_argumentos(argv)
+    # Antes de importar main: los workers heredan el entorno y con un solo
+    # worker uvicorn reutiliza el módulo ya importado por preparar(), así
+    # ninguno vuelve a crear tablas al arrancar
+    os.environ["DB_INIT_EN_STARTUP"] = "false"
+    if args.workers > 1:
+        # La caché de autos es por proceso y una escritura solo invalida la del
+        # worker que la atendió: un TTL corto acota cuánto puede quedar vieja
+        os.environ.setdefault("AUTO_CACHE_TTL", "5")
+    if not args.sin_preparar:
+        preparar()
+    if args.solo_preparar:
+        return 0
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        proxy_headers=True,
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+from sqlmodel import Session
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date, datetime
+from models import Venta, EstadoAuto, PeriodoVentas
+from repository import EstadisticasRepository
+from cola import tarea
+import exportacion
+import os
+import tempfile
+import time
+import uuid
+
+# Tareas que corren en segundo plano; importar este módulo las registra en la cola
+
+# Directorio donde quedan los archivos generados por los trabajos
+TRABAJOS_DIR = os.getenv("TRABAJOS_DIR", os.path.join(tempfile.gettempdir(), "concesionaria_trabajos"))
+
+# Horas que se conservan esos archivos; los más viejos se borran al terminar cada exportación
+TRABAJOS_RETENCION_HORAS = float(os.getenv("TRABAJOS_RETENCION_HORAS", "24"))
+
+class ParametrosExportacionAutos(BaseModel):
+    formato: exportacion.FormatoExportacion = exportacion.FormatoExportacion.NDJSON
+    desde: Optional[datetime] = None
+    hasta: Optional[datetime] = None
+    estado: Optional[EstadoAuto] = None
+
+class ParametrosExportacionVentas(BaseModel):
+    formato: exportacion.FormatoExportacion = exportacion.FormatoExportacion.NDJSON
+    desde: Optional[datetime] = None
+    hasta: Optional[datetime] = None
+
+class ParametrosEstadisticasVentas(BaseModel):
+    periodo: PeriodoVentas = PeriodoVentas.MES
+    desde: Optional[date] = None
+    hasta: Optional[date] = None
+    por_marca: bool = False
+    por_modelo: bool = False
+    marca: Optional[str] = None
+
+class SinParametros(BaseModel):
+    pass
+
+@tarea("comprobante_venta")
+def comprobante_venta(session: Session, parametros: dict) -> dict:
+    """Comprobante de una venta, encolado por VentaRepository.create"""
+    venta = session.get(Venta, parametros["venta_id"])
+    if not venta:
+        raise ValueError(f"Venta {parametros['venta_id']} no encontrada")
+    auto = venta.auto
+    return {
+        "numero": f"V-{venta.id:08d}",
+        "venta_id": venta.id,
+        "fecha": venta.fecha_venta.isoformat(),
+        "comprador": venta.nombre_comprador,
+        "auto": {
+            "id": auto.id,
+            "marca": auto.marca,
+            "modelo": auto.modelo,
+            "anio": auto.anio,
+            "numero_chasis": auto.numero_chasis,
+        },
+        "precio": venta.precio,
+    }
+
+@tarea("estadisticas_generales", concurrencia=1, publica=True, parametros=SinParametros)
+def estadisticas_generales(session: Session, parametros: dict) -> dict:
+    """Mismo resultado que GET /estadisticas"""
+    return EstadisticasRepository(session).obtener_resumen()
+
+@tarea("estadisticas_ventas", concurrencia=1, publica=True, parametros=ParametrosEstadisticasVentas)
+def estadisticas_ventas(session: Session, parametros: dict) -> list:
+    """Mismo resultado que GET /estadisticas/ventas"""
+    p = ParametrosEstadisticasVentas(**parametros)
+    return EstadisticasRepository(session).obtener_analitica_ventas(
+        p.periodo.value, p.desde, p.hasta, p.por_marca, p.por_modelo, p.marca
+    )
+
+def _exportar(session: Session, statement, columnas, formato: exportacion.FormatoExportacion, nombre: str) -> dict:
+    os.makedirs(TRABAJOS_DIR, exist_ok=True)
+    ruta = os.path.join(TRABAJOS_DIR, f"{nombre}-{uuid.uuid4().hex}.{formato.value}")
+    filas = exportacion.escribir_archivo(session, statement, columnas, formato, ruta)
+    _podar_archivos(ruta)
+    return {"archivo": ruta, "formato": formato.value, "filas": filas}
+
+def _podar_archivos(conservar: str):
+    """Borra los archivos de trabajos anteriores a TRABAJOS_RETENCION_HORAS"""
+    limite = time.time() - TRABAJOS_RETENCION_HORAS * 3600
+    with os.scandir(TRABAJOS_DIR) as entradas:
+        for entrada in entradas:
+            if entrada.path == conservar or not entrada.is_file():
+                continue
+            try:
+                if entrada.stat().st_mtime < limite:
+                    os.remove(entrada.path)
+            except FileNotFoundError:
+                # Otro proceso lo borró primero
+                pass
+
+@tarea("exportar_autos", concurrencia=1, publica=True, parametros=ParametrosExportacionAutos)
+def exportar_autos(session: Session, parametros: dict) -> dict:
+    """Exportación completa de autos a un archivo, como GET /autos/export"""
+    p = ParametrosExportacionAutos(**parametros)
+    statement = exportacion.sentencia_autos(p.desde, p.hasta, p.estado.value if p.estado else None)
+    return _exportar(session, statement, exportacion.COLUMNAS_AUTO, p.formato, "autos")
+
+@tarea("exportar_ventas", concurrencia=1, publica=True, parametros=ParametrosExportacionVentas)
+def exportar_ventas(session: Session, parametros: dict) -> dict:
+    """Exportación completa de ventas a un archivo, como GET /ventas/export"""
+    p = ParametrosExportacionVentas(**parametros)
+    statement = exportacion.sentencia_ventas(p.desde, p.hasta)
+    return _exportar(session, statement, exportacion.COLUMNAS_VENTA, p.formato, "ventas")
@@ -0,0 +1,37 @@
+import itertools
+import os
+import sys
+import tempfile
+import pytest
+
+# La app lee la configuración al importarse: base SQLite descartable y sin worker de la cola
+_DIRECTORIO = tempfile.mkdtemp(prefix="concesionaria_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DIRECTORIO, 'tests.db')}"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["TRABAJOS_WORKER"] = "false"
+os.environ["TRABAJOS_DIR"] = os.path.join(_DIRECTORIO, "trabajos")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+_chasis = itertools.count()
+
+@pytest.fixture(scope="session")
+def cliente():
+    import main
+    with TestClient(main.app) as cliente:
+        yield cliente
+
+@pytest.fixture
+def crear_auto(cliente):
+    """Da de alta un auto disponible y devuelve su id"""
+    def _crear(**datos) -> int:
+        respuesta = cliente.post("/autos/", json={
+            "marca": "Test", "modelo": "Prueba", "anio": 2022,
+            "numero_chasis": f"TEST{next(_chasis):012d}",
+            "precio": 10000, "kilometraje": 0, "color": "gris", "tipo_combustible": "nafta",
+            **datos,
+        })
+        assert respuesta.status_code == 200, respuesta.text
+        return respuesta.json()["id"]
+    return _crear
@@ -0,0 +1,16 @@
+import cache
+
+def test_carga_concurrente_con_invalidacion_no_queda_en_cache():
+    auto_cache = cache.CacheLRU(max_items=10, ttl=60)
+
+    def cargar_viejo():
+        # Una escritura invalida la clave mientras la carga todavía corre
+        auto_cache.invalidar(("id", 1))
+        return b'{"estado": "disponible"}'
+
+    assert auto_cache.obtener(("id", 1), cargar_viejo).cuerpo == b'{"estado": "disponible"}'
+    assert auto_cache.get(("id", 1)) is None
+    assert auto_cache.estadisticas()["descartadas"] == 1
+
+    nuevo = auto_cache.obtener(("id", 1), lambda: b'{"estado": "vendido"}')
+    assert auto_cache.get(("id", 1)).etag == nuevo.etag
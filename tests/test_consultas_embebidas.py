@@ -0,0 +1,40 @@
+from sqlalchemy import event
+import pytest
+import database
+
+# Sentencias por request de los listados con relaciones embebidas (sin N+1):
+# a lo sumo dos SELECT, sin importar el tamaño de la página
+MAXIMO_CONSULTAS = 2
+
+@pytest.fixture
+def contar_sentencias():
+    total = [0]
+
+    def _contar(*args):
+        total[0] += 1
+
+    motores = (database.engine, database.async_engine.sync_engine)
+    for motor in motores:
+        event.listen(motor, "before_cursor_execute", _contar)
+    yield total
+    for motor in motores:
+        event.remove(motor, "before_cursor_execute", _contar)
+
+@pytest.fixture
+def autos_vendidos(cliente, crear_auto):
+    for i in range(30):
+        auto_id = crear_auto()
+        respuesta = cliente.post("/ventas/", json={"nombre_comprador": f"Comprador {i}", "precio": 9000, "auto_id": auto_id})
+        assert respuesta.status_code == 200, respuesta.text
+
+@pytest.mark.parametrize("path", ["/autos/with-ventas", "/ventas/with-auto"])
+def test_consultas_constantes_por_pagina(cliente, autos_vendidos, contar_sentencias, path):
+    consultas = []
+    for limit in (5, 25):
+        antes = contar_sentencias[0]
+        respuesta = cliente.get(path, params={"limit": limit})
+        assert respuesta.status_code == 200, respuesta.text
+        assert len(respuesta.json()) == limit
+        consultas.append(contar_sentencias[0] - antes)
+    assert consultas[0] == consultas[1]
+    assert consultas[0] <= MAXIMO_CONSULTAS
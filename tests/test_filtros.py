@@ -0,0 +1,7 @@
+def test_filtro_por_combustible_de_las_facetas(cliente, crear_auto):
+    auto_id = crear_auto(tipo_combustible="nafta")
+    catalogo = cliente.get("/autos/catalogo").json()
+    assert "nafta" in catalogo["facetas"]["tipo_combustible"]
+    respuesta = cliente.get("/autos/", params={"tipo_combustible": "nafta"})
+    assert respuesta.status_code == 200
+    assert auto_id in [auto["id"] for auto in respuesta.json()]
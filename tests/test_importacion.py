@@ -0,0 +1,27 @@
+import asyncio
+import importacion
+
+def _filas(cuerpo: bytes) -> list:
+    async def stream():
+        # Trozos chicos para que los registros queden partidos entre chunks
+        for inicio in range(0, len(cuerpo), 7):
+            yield cuerpo[inicio:inicio + 7]
+
+    async def leer():
+        return [fila async for fila in importacion.leer_filas("csv", stream())]
+
+    return asyncio.run(leer())
+
+def test_csv_con_comillas_sueltas_y_saltos_de_linea():
+    filas = _filas(
+        b'marca,descripcion,anio\r\n'
+        b'Ford,Pantalla 10" tactil,2020\n'
+        b'Ford,"linea1\nlinea2, con ""comillas""",2021\n'
+        b'\n'
+        b'VW,simple,2019\n'
+    )
+    assert filas == [
+        (1, {"marca": "Ford", "descripcion": 'Pantalla 10" tactil', "anio": "2020"}),
+        (2, {"marca": "Ford", "descripcion": 'linea1\nlinea2, con "comillas"', "anio": "2021"}),
+        (3, {"marca": "VW", "descripcion": "simple", "anio": "2019"}),
+    ]
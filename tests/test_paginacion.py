@@ -0,0 +1,45 @@
+import base64
+import json
+import pytest
+
+@pytest.mark.parametrize("path", ["/autos/", "/ventas/"])
+@pytest.mark.parametrize("limit", [0, -3])
+def test_limit_fuera_de_rango(cliente, path, limit):
+    assert cliente.get(path, params={"limit": limit}).status_code == 422
+
+def test_catalogo_limit_cero(cliente):
+    assert cliente.get("/autos/catalogo", params={"limit": 0}).status_code == 422
+
+@pytest.mark.parametrize("orden, valor, ultimo_id", [
+    ("precio", [1, 2], 3),
+    ("precio", "abc", 3),
+    ("precio", None, 3),
+    ("anio", 2020.5, 3),
+    ("marca", 7, 3),
+    ("fecha_ingreso", 5, 3),
+    ("id", 3, None),
+    ("id", 3, "3"),
+    ("id", 3, [3]),
+])
+def test_cursor_con_valor_de_otro_tipo(cliente, orden, valor, ultimo_id):
+    crudo = json.dumps([orden, valor, ultimo_id]).encode()
+    cursor = base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+    respuesta = cliente.get("/autos/", params={"orden": orden, "cursor": cursor})
+    assert respuesta.status_code == 400
+    assert respuesta.json()["detail"] == "Cursor inválido"
+
+@pytest.mark.parametrize("orden", ["id", "precio", "anio", "kilometraje", "marca", "fecha_ingreso"])
+def test_cursor_recorre_todas_las_paginas(cliente, crear_auto, orden):
+    for _ in range(3):
+        crear_auto()
+    total = len(cliente.get("/autos/", params={"orden": orden, "limit": 1000}).json())
+    vistos, cursor = [], None
+    while True:
+        params = {"orden": orden, "limit": 2, **({"cursor": cursor} if cursor else {})}
+        respuesta = cliente.get("/autos/", params=params)
+        assert respuesta.status_code == 200
+        vistos += [auto["id"] for auto in respuesta.json()]
+        cursor = respuesta.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert len(vistos) == len(set(vistos)) == total
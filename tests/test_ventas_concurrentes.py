@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import time
+
+AUTOS = 4
+INTENTOS_POR_AUTO = 50
+CONCURRENCIA = 32
+
+# Piso de throughput de POST /ventas bajo contención; holgado para no depender
+# de la máquina, pero detecta que las ventas se serialicen con esperas largas
+VENTAS_POR_SEGUNDO_MINIMAS = 20
+
+def _vender(cliente, auto_id, clave):
+    respuesta = cliente.post(
+        "/ventas/",
+        json={"nombre_comprador": "Concurrente", "precio": 9000, "auto_id": auto_id},
+        headers={"Idempotency-Key": clave},
+    )
+    return auto_id, clave, respuesta
+
+def test_cada_auto_se_vende_una_sola_vez(cliente, crear_auto):
+    autos = [crear_auto() for _ in range(AUTOS)]
+    intentos = [
+        (auto_id, f"concurrente-{auto_id}-{i}")
+        for i, auto_id in itertools.product(range(INTENTOS_POR_AUTO), autos)
+    ]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCIA) as ejecutor:
+        resultados = list(ejecutor.map(lambda intento: _vender(cliente, *intento), intentos))
+    duracion = time.perf_counter() - inicio
+
+    ganadoras = {}
+    for auto_id, clave, respuesta in resultados:
+        assert respuesta.status_code in (200, 409), respuesta.text
+        if respuesta.status_code == 200:
+            assert auto_id not in ganadoras, f"el auto {auto_id} se vendió dos veces"
+            ganadoras[auto_id] = (clave, respuesta.json()["id"])
+    assert set(ganadoras) == set(autos)
+    assert sum(1 for _, _, r in resultados if r.status_code == 409) == len(intentos) - len(autos)
+    assert len(intentos) / duracion >= VENTAS_POR_SEGUNDO_MINIMAS, f"{len(intentos) / duracion:.1f} ventas/s"
+
+    for auto_id, (clave, venta_id) in ganadoras.items():
+        _, _, reintento = _vender(cliente, auto_id, clave)
+        assert reintento.status_code == 200
+        assert reintento.json()["id"] == venta_id
+        assert len(cliente.get(f"/ventas/auto/{auto_id}").json()) == 1
+
+def test_reintentos_paralelos_con_la_misma_clave(cliente, crear_auto):
+    auto_id = crear_auto()
+    with ThreadPoolExecutor(max_workers=CONCURRENCIA) as ejecutor:
+        resultados = list(ejecutor.map(
+            lambda _: _vender(cliente, auto_id, f"reintento-{auto_id}"), range(INTENTOS_POR_AUTO)
+        ))
+    assert all(respuesta.status_code == 200 for _, _, respuesta in resultados)
+    assert len({respuesta.json()["id"] for _, _, respuesta in resultados}) == 1
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import get_async_session
+from repository_async import AsyncTrabajoRepository
+from pydantic import ValidationError
+from cola import TAREAS, TRABAJOS_POLL_SEGUNDOS, cola
+import exportacion
+import json
+import math
+import os
+import models
+
+router = APIRouter(prefix="/trabajos", tags=["Trabajos"])
+
+# El estado de un trabajo se consulta siempre en el primario: una réplica
+# atrasada lo mostraría pendiente después de terminado.
+
+def respuesta_trabajo(trabajo: models.Trabajo) -> Response:
+    """Resultado de un trabajo terminado, o 202 / 409 según su estado
+
+    Las tareas que generan un archivo devuelven `{"archivo": ruta, "formato": ...}`
+    y se responde con el archivo; el resto, con su resultado JSON.
+    """
+    if trabajo.estado == models.EstadoTrabajo.FALLIDO.value:
+        raise HTTPException(status_code=409, detail=f"El trabajo falló: {trabajo.error}")
+    if trabajo.estado != models.EstadoTrabajo.COMPLETADO.value:
+        return JSONResponse(
+            jsonable_encoder(models.TrabajoResponse.from_orm(trabajo)),
+            status_code=202,
+            headers={"Retry-After": str(math.ceil(TRABAJOS_POLL_SEGUNDOS))},
+        )
+    resultado = json.loads(trabajo.resultado)
+    if isinstance(resultado, dict) and "archivo" in resultado:
+        if not os.path.exists(resultado["archivo"]):
+            raise HTTPException(status_code=410, detail="El archivo del trabajo ya no está disponible")
+        formato = exportacion.FormatoExportacion(resultado["formato"])
+        return FileResponse(
+            resultado["archivo"],
+            media_type=exportacion.MEDIA_TYPES[formato],
+            filename=f"{trabajo.tipo}-{trabajo.id}.{formato.value}",
+        )
+    return JSONResponse(resultado)
+
+@router.post("/", response_model=models.TrabajoResponse, status_code=202)
+async def encolar_trabajo(trabajo: models.TrabajoCreate, session: AsyncSession = Depends(get_async_session)):
+    """Encolar un reporte pesado o una exportación para correr en segundo plano
+
+    Tipos disponibles: `estadisticas_generales`, `estadisticas_ventas`,
+    `exportar_autos` y `exportar_ventas`; `parametros` lleva los mismos filtros
+    que el endpoint equivalente. Se consulta con GET /trabajos/{id}.
+    """
+    registrada = TAREAS.get(trabajo.tipo)
+    if not registrada or not registrada.publica:
+        raise HTTPException(status_code=400, detail=f"Tipo de trabajo desconocido: {trabajo.tipo}")
+    parametros = trabajo.parametros
+    if registrada.parametros is not None:
+        try:
+            parametros = json.loads(registrada.parametros(**parametros).json())
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors())
+    repo = AsyncTrabajoRepository(session)
+    creado = await repo.create(trabajo.tipo, parametros, trabajo.max_intentos)
+    cola.despertar()
+    return creado
+
+@router.get("/{trabajo_id}", response_model=models.TrabajoResponse)
+async def obtener_trabajo(trabajo_id: int, session: AsyncSession = Depends(get_async_session)):
+    """Estado de un trabajo: pendiente, en_curso, completado o fallido"""
+    repo = AsyncTrabajoRepository(session)
+    trabajo = await repo.get_by_id(trabajo_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+@router.get("/{trabajo_id}/resultado")
+async def resultado_trabajo(trabajo_id: int, session: AsyncSession = Depends(get_async_session)):
+    """Resultado del trabajo (JSON o archivo); 202 mientras no terminó"""
+    repo = AsyncTrabajoRepository(session)
+    trabajo = await repo.get_by_id(trabajo_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return respuesta_trabajo(trabajo)
@@ -1,85 +1,203 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from datetime import datetime
-from database import get_session
-from repository import VentaRepository
+from database import get_async_session, get_async_read_session, leer_tus_escrituras, motor_async_lectura
+from repository_async import AsyncVentaRepository, AsyncTrabajoRepository, AsyncCambioRepository
+from repository import AutoNoDisponibleError
+from cola import cola
+from trabajos import respuesta_trabajo
+import etags
+import exportacion
 import models
+import serializacion
 
 router = APIRouter(prefix="/ventas", tags=["Ventas"])
 
 @router.post("/", response_model=models.VentaResponse)
-def crear_venta(
+async def crear_venta(
     venta: models.VentaCreate, 
-    session: Session = Depends(get_session)
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    """Crear nueva venta"""
-    repo = VentaRepository(session)
+    """Crear nueva venta
+
+    Enviar el encabezado `Idempotency-Key` permite reintentar sin duplicar la venta.
+    Con réplicas configuradas, las lecturas siguientes del cliente van al primario
+    durante unos segundos para que vea la venta recién creada.
+    """
+    repo = AsyncVentaRepository(session)
     try:
-        return repo.create(venta)
+        creada = await repo.create(venta, idempotency_key)
+    except AutoNoDisponibleError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Error interno del servidor")
+    # El comprobante se generó como trabajo en la misma transacción
+    cola.despertar()
+    leer_tus_escrituras(response)
+    return creada
+
+@router.post("/batch", response_model=List[models.LoteVentaItem])
+async def obtener_ventas_por_ids(lote: models.LoteIdsRequest, session: AsyncSession = Depends(get_async_read_session)):
+    """Obtener varias ventas por id en una sola consulta, en el orden pedido"""
+    repo = AsyncVentaRepository(session)
+    ventas = await repo.get_many_by_ids(lote.ids)
+    return [
+        {"clave": str(venta_id), "encontrado": venta is not None, "venta": venta}
+        for venta_id, venta in zip(lote.ids, ventas)
+    ]
 
 @router.get("/", response_model=List[models.VentaResponse])
-def listar_ventas(
+async def listar_ventas(
+    request: Request,
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
-    session: Session = Depends(get_session)
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
+    orden: models.OrdenVentas = Query(models.OrdenVentas.ID),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Listar ventas con paginación
+
+    Sin `skip` se pagina por cursor: el encabezado `X-Next-Cursor` trae el
+    valor a enviar en `cursor` para pedir la página siguiente.
+    """
+    no_modificado = await etags.no_modificado(request, ("venta",))
+    if no_modificado:
+        return no_modificado
+    repo = AsyncVentaRepository(session)
+    rapida = serializacion.activa("listar_ventas")
+    columnas = serializacion.COLUMNAS_VENTA if rapida else None
+    headers = await etags.encabezados(request, session, ("venta",))
+    if cursor or not skip:
+        try:
+            ventas, next_cursor = await repo.get_page(cursor, limit, orden.value, columnas)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+    else:
+        ventas = await repo.get_all(skip, limit, columnas)
+    if rapida:
+        return serializacion.respuesta(serializacion.CAMPOS_VENTA, ventas, headers)
+    response.headers.update(headers)
+    return ventas
+
+@router.get("/export")
+async def exportar_ventas(
+    request: Request,
+    formato: exportacion.FormatoExportacion = exportacion.FormatoExportacion.NDJSON,
+    desde: Optional[datetime] = Query(None, description="fecha_venta desde"),
+    hasta: Optional[datetime] = Query(None, description="fecha_venta hasta"),
 ):
-    """Listar ventas con paginación"""
-    repo = VentaRepository(session)
-    return repo.get_all(skip, limit)
+    """Exportar ventas como NDJSON o CSV en streaming"""
+    statement = exportacion.sentencia_ventas(desde, hasta)
+    return StreamingResponse(
+        exportacion.generar(statement, exportacion.COLUMNAS_VENTA, formato, motor_async_lectura(request)),
+        media_type=exportacion.MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f"attachment; filename=ventas.{formato.value}"},
+    )
+
+@router.get("/with-auto", response_model=List[models.VentaResponseWithAuto])
+async def listar_ventas_con_auto(
+    desde: Optional[datetime] = Query(None, description="fecha_venta desde"),
+    hasta: Optional[datetime] = Query(None, description="fecha_venta hasta"),
+    skip: int = 0,
+    limit: int = Query(100, le=500),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Listar ventas con la información del auto, opcionalmente por rango de fechas"""
+    repo = AsyncVentaRepository(session)
+    return await repo.get_with_auto(desde, hasta, skip, limit)
 
 @router.get("/{venta_id}", response_model=models.VentaResponse)
-def obtener_venta(venta_id: int, session: Session = Depends(get_session)):
+async def obtener_venta(venta_id: int, session: AsyncSession = Depends(get_async_read_session)):
     """Obtener venta por ID"""
-    repo = VentaRepository(session)
-    venta = repo.get_by_id(venta_id)
+    repo = AsyncVentaRepository(session)
+    venta = await repo.get_by_id(venta_id)
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
     return venta
 
+@router.get("/{venta_id}/comprobante")
+async def obtener_comprobante(venta_id: int, session: AsyncSession = Depends(get_async_session)):
+    """Comprobante de la venta, generado en segundo plano; 202 mientras no está listo"""
+    repo = AsyncTrabajoRepository(session)
+    trabajo = await repo.get_by_clave(f"comprobante_venta:{venta_id}")
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Comprobante no encontrado")
+    return respuesta_trabajo(trabajo)
+
+@router.get("/{venta_id}/historial", response_model=List[models.CambioResponse])
+async def historial_venta(
+    venta_id: int,
+    desde: Optional[datetime] = Query(None),
+    hasta: Optional[datetime] = Query(None),
+    limit: int = Query(100, le=1000),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Alta, modificaciones y baja de una venta"""
+    repo = AsyncCambioRepository(session)
+    return await repo.historial("venta", venta_id, desde, hasta, limit)
+
 @router.put("/{venta_id}", response_model=models.VentaResponse)
-def actualizar_venta(
+async def actualizar_venta(
     venta_id: int, 
     venta_update: models.VentaUpdate, 
-    session: Session = Depends(get_session)
+    response: Response,
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Actualizar venta"""
-    repo = VentaRepository(session)
-    venta = repo.update(venta_id, venta_update)
+    repo = AsyncVentaRepository(session)
+    venta = await repo.update(venta_id, venta_update)
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
+    leer_tus_escrituras(response)
     return venta
 
 @router.delete("/{venta_id}")
-def eliminar_venta(venta_id: int, session: Session = Depends(get_session)):
+async def eliminar_venta(venta_id: int, response: Response, session: AsyncSession = Depends(get_async_session)):
     """Eliminar venta"""
-    repo = VentaRepository(session)
-    success = repo.delete(venta_id)
+    repo = AsyncVentaRepository(session)
+    success = await repo.delete(venta_id)
     if not success:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
+    leer_tus_escrituras(response)
     return {"message": "Venta eliminada correctamente"}
 
 @router.get("/auto/{auto_id}", response_model=List[models.VentaResponse])
-def ventas_por_auto(auto_id: int, session: Session = Depends(get_session)):
+async def ventas_por_auto(auto_id: int, session: AsyncSession = Depends(get_async_read_session)):
     """Obtener ventas de un auto específico"""
-    repo = VentaRepository(session)
-    return repo.get_by_auto_id(auto_id)
+    repo = AsyncVentaRepository(session)
+    if serializacion.activa("ventas_por_auto"):
+        ventas = await repo.get_by_auto_id(auto_id, serializacion.COLUMNAS_VENTA)
+        return serializacion.respuesta(serializacion.CAMPOS_VENTA, ventas)
+    return await repo.get_by_auto_id(auto_id)
 
 @router.get("/comprador/{nombre}", response_model=List[models.VentaResponse])
-def ventas_por_comprador(nombre: str, session: Session = Depends(get_session)):
+async def ventas_por_comprador(
+    nombre: str,
+    skip: int = 0,
+    limit: int = 100,
+    session: AsyncSession = Depends(get_async_read_session)
+):
     """Obtener ventas por nombre de comprador"""
-    repo = VentaRepository(session)
-    return repo.get_by_comprador(nombre)
+    repo = AsyncVentaRepository(session)
+    if serializacion.activa("ventas_por_comprador"):
+        ventas = await repo.get_by_comprador(nombre, skip, limit, serializacion.COLUMNAS_VENTA)
+        return serializacion.respuesta(serializacion.CAMPOS_VENTA, ventas)
+    return await repo.get_by_comprador(nombre, skip, limit)
 
 @router.get("/{venta_id}/with-auto", response_model=models.VentaResponseWithAuto)
-def venta_con_auto(venta_id: int, session: Session = Depends(get_session)):
+async def venta_con_auto(venta_id: int, session: AsyncSession = Depends(get_async_read_session)):
     """Obtener venta con información del auto"""
-    repo = VentaRepository(session)
-    venta = repo.get_by_id(venta_id)
+    repo = AsyncVentaRepository(session)
+    venta = await repo.get_by_id_with_auto(venta_id)
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
     return venta
\ No newline at end of file